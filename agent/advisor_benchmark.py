@@ -0,0 +1,137 @@
+"""
+Load test for the advisor pipeline on the fake LLM backend.
+
+Drives ESGAdvisorSystem.run_analysis from N concurrent sessions, with the
+response cache off and fresh checkpoints, and reports latency percentiles
+and pipeline overhead: wall time beyond the model time on the critical path
+(the slowest first-level stage plus strategy). Time queued in the LLM
+scheduler is part of the overhead and is also reported on its own.
+
+The scheduler's rate limit is off unless --rate is given, so queueing
+reflects only the concurrency limit; both limits are printed with the
+results.
+
+    python -m agent.advisor_benchmark --sessions 8 --runs 3 --latency 0.2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+
+def sample_kpi_data(industry: str) -> Dict[str, float]:
+    """Deterministic KPI values for every KPI of an industry"""
+    from agent.agentic_chatbot import get_shared_data_manager
+
+    kpis_by_category = get_shared_data_manager().get_industry_kpis_by_category(industry)
+    return {
+        kpi: float(40 + zlib.crc32(kpi.encode("utf-8")) % 60)
+        for kpis in kpis_by_category.values()
+        for kpi in kpis
+    }
+
+
+def _critical_path_seconds(llm_calls: List[Dict], strategy_role: str) -> float:
+    first_level = [call["seconds"] for call in llm_calls if call["role"] != strategy_role]
+    strategy = [call["seconds"] for call in llm_calls if call["role"] == strategy_role]
+    return max(first_level, default=0.0) + sum(strategy)
+
+
+def run_session(industry: str, data: Dict, runs: int, checkpoint_root: str) -> List[Dict]:
+    """Run the full analysis runs times in one session and collect timings"""
+    from agent.agentic_chatbot import AGENT_SPECS, ESGAdvisorSystem
+
+    advisor = ESGAdvisorSystem(use_cache=False)
+    advisor.checkpoint_root = checkpoint_root
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = advisor.run_analysis({"type": "full_analysis", "data": data}, industry)
+        wall = time.perf_counter() - start
+        summary = advisor.last_timings.breakdown()
+        model_seconds = _critical_path_seconds(summary["llm_calls"], AGENT_SPECS['strategy']['role'])
+        results.append({
+            "wall_seconds": wall,
+            "model_seconds": model_seconds,
+            "overhead_seconds": max(0.0, wall - model_seconds),
+            "queue_seconds": summary["queue_seconds"],
+            "llm_calls": len(summary["llm_calls"]),
+            "failed": not advisor.last_run_ok
+        })
+    return results
+
+
+def benchmark_sessions(industry: str, sessions: int, runs: int) -> Dict[str, float]:
+    """
+    Run concurrent advisor sessions and summarize their latencies.
+
+    Args:
+        industry (str): Industry whose KPIs make up the request
+        sessions (int): Number of concurrent sessions
+        runs (int): Sequential analyses per session
+
+    Returns:
+        Dict[str, float]: Latency and overhead percentiles and throughput
+    """
+    data = sample_kpi_data(industry)
+    checkpoint_root = tempfile.mkdtemp(prefix="esg-benchmark-")
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="esg-session") as executor:
+            futures = [executor.submit(run_session, industry, data, runs, checkpoint_root)
+                    for _ in range(sessions)]
+            results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(checkpoint_root, ignore_errors=True)
+
+    wall = np.array([r["wall_seconds"] for r in results])
+    overhead = np.array([r["overhead_seconds"] for r in results])
+    return {
+        "runs": len(results),
+        "failed": sum(r["failed"] for r in results),
+        "kpis": len(data),
+        "p50_seconds": float(np.percentile(wall, 50)),
+        "p95_seconds": float(np.percentile(wall, 95)),
+        "mean_model_seconds": float(np.mean([r["model_seconds"] for r in results])),
+        "p50_overhead_seconds": float(np.percentile(overhead, 50)),
+        "p95_overhead_seconds": float(np.percentile(overhead, 95)),
+        "mean_queue_seconds": float(np.mean([r["queue_seconds"] for r in results])),
+        "runs_per_second": len(results) / elapsed
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent advisor sessions on the fake LLM")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions")
+    parser.add_argument("--runs", type=int, default=3, help="Analyses per session")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra fake seconds per call")
+    parser.add_argument("--industry", help="Industry to benchmark; defaults to the first one")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="LLM scheduler requests per minute; 0 disables the rate limit")
+    args = parser.parse_args()
+
+    # The backend is chosen when agent.agentic_chatbot is first imported
+    os.environ["ESG_LLM_BACKEND"] = "fake"
+    os.environ["ESG_FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["ESG_FAKE_LLM_JITTER"] = str(args.jitter)
+    os.environ["ESG_LLM_RATE_PER_MINUTE"] = str(args.rate)
+
+    from agent.agentic_chatbot import get_shared_data_manager
+    from agent.llm_scheduler import get_llm_scheduler
+    selected_industry = args.industry or get_shared_data_manager().get_industries()[0]
+    scheduler = get_llm_scheduler()
+
+    print(f"{args.sessions} sessions x {args.runs} runs, industry: {selected_industry}, "
+        f"fake latency {args.latency}s (+{args.jitter}s jitter)")
+    print(f"LLM scheduler: {scheduler.max_concurrency} concurrent calls, "
+        + (f"{scheduler.rate_per_second * 60:g} requests/min" if scheduler.rate_per_second else "no rate limit"))
+    for metric, value in benchmark_sessions(selected_industry, args.sessions, args.runs).items():
+        print(f"{metric:>22}: {value:.3f}" if isinstance(value, float) else f"{metric:>22}: {value}")
@@ -1,7 +1,21 @@
 from crewai import Agent, Task, Crew, Process,LLM
-from typing import Dict, List, Optional
-import json
-from agent.progress import ProgressTracker, AnalysisStage
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import threading
+import time
+import uuid
+from agent.progress import ProgressTracker, AnalysisStage, RunTimings, in_script_thread
+from agent.pipeline import CHECKPOINT_DIR, PipelineStage, StageCheckpoint, StagePipeline, hash_kpi_data
+from agent.fake_llm import LLM_BACKEND, FakeLLM
+from agent.knowledge_index import RETRIEVAL_TOP_K, get_knowledge_index
+from agent.llm_cache import LLM_CACHE_ENABLED, get_llm_cache
+from agent.llm_scheduler import INTERACTIVE, get_llm_scheduler
+from agent.prompt_utils import compact_json, estimate_tokens, fit_to_budget, render_prompt
+from agent.stage_schemas import CATEGORY_SCHEMA, DATA_SCHEMA, StageSchema
+from agent.telemetry import get_telemetry
+from utils.data_manager import DataManager
+from utils.kpi_analytics import analytics_markdown, analyze_kpis, category_view
 # from agent.llm_config import LLMFactory
 import streamlit as st
 import os
@@ -10,26 +24,81 @@ load_dotenv()
 
 # os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY")
 # os.environ["GROQ_API_KEY2"] = os.getenv("GROQ_API_KEY2")
-os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
+# Unset with the fake backend; crewai reads the key from the environment
+if os.getenv("GEMINI_API_KEY") is not None:
+    os.environ["GEMINI_API_KEY"] = os.getenv("GEMINI_API_KEY")
 print("Gemini")
 
+ESG_CATEGORIES = ['environmental', 'social', 'governance']
+# Request types answered from existing stage outputs instead of a new strategy
+FOLLOW_UP_TYPES = ('question', 'chat')
+# Token budget for the analysis context of a follow-up answer
+ANSWER_CONTEXT_TOKENS = 2400
+
+AGENT_SPECS = {
+    'data': {
+        'role': 'ESG Data Processor',
+        'goal': 'Process and validate ESG metrics',
+        'backstory': """Expert in ESG data processing and validation, ensuring 
+                data quality and standardization.""",
+        'llm_type': 'analysis'
+    },
+    'environmental': {
+        'role': 'Environmental Analyst',
+        'goal': 'Analyze environmental performance',
+        'backstory': """Specialist in environmental metrics, climate impact, 
+                and sustainability practices.""",
+        'llm_type': 'analysis'
+    },
+    'social': {
+        'role': 'Social Impact Analyst',
+        'goal': 'Analyze social performance',
+        'backstory': """Expert in social metrics, workforce analytics, and 
+                community impact assessment.""",
+        'llm_type': 'analysis'
+    },
+    'governance': {
+        'role': 'Governance Analyst',
+        'goal': 'Analyze governance structure',
+        'backstory': """Specialist in corporate governance, ethics, and 
+                compliance frameworks.""",
+        'llm_type': 'analysis'
+    },
+    'strategy': {
+        'role': 'Strategy Developer',
+        'goal': 'Develop improvement strategies',
+        'backstory': """Expert in ESG strategy development and 
+                implementation planning.""",
+        'llm_type': 'strategy'
+    },
+    'communication': {
+        'role': 'Communication Specialist',
+        'goal': 'Present findings effectively',
+        'backstory': """Specialist in presenting ESG information to 
+                different stakeholders.""",
+        'llm_type': 'chat'
+    }
+}
+
 def create_llm(model_type: str) -> LLM:
-        """Create an LLM instance based on type"""
+        """Create an LLM instance based on type; ESG_LLM_BACKEND=fake returns a local fake"""
+        if LLM_BACKEND == "fake":
+            return FakeLLM(model_type)
         
         configs = {
             'analysis': {
                 'model': "gemini/gemini-1.5-flash",
                 'temperature': 0.1,
-                'api_key': os.environ["GEMINI_API_KEY"]
+                'api_key': os.getenv("GEMINI_API_KEY")
             },
             'strategy': {
                 'model': "gemini/gemini-1.5-flash",
                 'temperature': 0.2,
-                'api_key': os.environ["GEMINI_API_KEY"]
+                'api_key': os.getenv("GEMINI_API_KEY")
             },
             'chat': {
                 'model': "gemini/gemini-1.5-flash",
-                'api_key': os.environ["GEMINI_API_KEY"]
+                'api_key': os.getenv("GEMINI_API_KEY")
             }
         }
         
@@ -44,167 +113,421 @@ def create_llm(model_type: str) -> LLM:
             api_key=config['api_key']
         )
 
+_llm_clients: Dict[str, LLM] = {}
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm(model_type: str) -> LLM:
+    """Return the process-wide LLM client for a model type, creating it once"""
+    with _llm_clients_lock:
+        if model_type not in _llm_clients:
+            _llm_clients[model_type] = create_llm(model_type)
+        return _llm_clients[model_type]
+
 class BaseAgent:
-    """Base class for all ESG agents"""
+    """
+    Base class for all ESG agents
+
+    The LLM client is shared per model type. crewai agents keep per-call
+    executor state, so each concurrent call checks out its own crewai Agent;
+    instances are created only when all existing ones are busy and are reused
+    afterwards.
+    """
     
     def __init__(self, role: str, goal: str, backstory: str, llm_type: str):
-        self.llm = create_llm(llm_type)
-        self.agent = Agent(
-            role=role,
-            goal=goal,
-            backstory=backstory,
+        self.role = role
+        self.goal = goal
+        self.backstory = backstory
+        self.llm = get_llm(llm_type)
+        self._lock = threading.Lock()
+        self._primary: Optional[Agent] = None
+        self._idle: List[Agent] = []
+
+    def _new_agent(self) -> Agent:
+        return Agent(
+            role=self.role,
+            goal=self.goal,
+            backstory=self.backstory,
             verbose=True,
             allow_delegation=False,
-            llm=self.llm
+            # Retries are handled and counted by the LLM scheduler
+            max_retry_limit=0,
+            # The fake backend is called directly; crewai only needs a model name
+            llm=self.llm.model if isinstance(self.llm, FakeLLM) else self.llm
+        )
+
+    @property
+    def agent(self) -> Agent:
+        """The first crewai agent for this role, used when building tasks"""
+        with self._lock:
+            if self._primary is None:
+                self._primary = self._new_agent()
+                self._idle.append(self._primary)
+            return self._primary
+
+    @contextmanager
+    def _checkout(self) -> Iterator[Agent]:
+        """Borrow an idle crewai agent for one call"""
+        self.agent
+        with self._lock:
+            instance = self._idle.pop() if self._idle else None
+        if instance is None:
+            instance = self._new_agent()
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                self._idle.append(instance)
+        
+    def _call(self, task: Task, priority: int = INTERACTIVE) -> Tuple[str, int, float]:
+        """
+        Run a task on the model through the process-wide scheduler.
+
+        Returns:
+            tuple: (response, number of retries, seconds queued)
+        """
+        def call() -> str:
+            if isinstance(self.llm, FakeLLM):
+                return self.llm.call(f"{task.description}\n{task.expected_output}", self.role)
+            with self._checkout() as agent:
+                return agent.execute_task(task)
+
+        return get_llm_scheduler().call(call, priority, label=self.role)
+
+    def _record(self,
+                session_id: Optional[str],
+                prompt: str,
+                response: str,
+                start: float,
+                retries: int = 0,
+                queue_seconds: float = 0.0,
+                cached: bool = False,
+                streamed: bool = False,
+                usage: Optional[Dict] = None,
+                error: Optional[str] = None) -> Dict:
+        """Send one call's telemetry, estimating tokens when usage is not reported"""
+        return get_telemetry().record(
+            session_id,
+            self.role,
+            self.llm.model,
+            prompt_tokens=usage['prompt_tokens'] if usage else estimate_tokens(prompt),
+            completion_tokens=usage['completion_tokens'] if usage else estimate_tokens(response),
+            wall_seconds=time.perf_counter() - start - queue_seconds,
+            queue_seconds=queue_seconds,
+            retries=retries,
+            cached=cached,
+            streamed=streamed,
+            estimated_tokens=usage is None,
+            error=error
         )
         
-    def execute_task(self, task: Task) -> str:
-        return self.agent.execute_task(task)
+    def execute_task(self,
+                    task: Task,
+                    use_cache: bool = True,
+                    session_id: Optional[str] = None,
+                    priority: int = INTERACTIVE,
+                    call_stats: Optional[Dict] = None) -> str:
+        """
+        Execute a task, serving repeated prompts from the shared response cache.
+
+        Args:
+            task (Task): Task to run
+            use_cache (bool): Set to False to force a fresh LLM call
+            session_id (str): Session the call is attributed to in telemetry
+            priority (int): Scheduler priority, INTERACTIVE or BATCH
+            call_stats (Dict): Updated with the call's telemetry record, so
+                callers can report queue wait apart from model time
+
+        Returns:
+            str: The agent's response
+        """
+        start = time.perf_counter()
+        prompt = f"{task.description}\n{task.expected_output}"
+        cache = get_llm_cache() if use_cache and LLM_CACHE_ENABLED else None
+        key = cache.make_key(self.role, self.llm.model, prompt) if cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                record = self._record(session_id, prompt, cached, start, cached=True)
+                if call_stats is not None:
+                    call_stats.update(record)
+                return cached
+
+        try:
+            result, retries, queue_seconds = self._call(task, priority)
+        except Exception as e:
+            self._record(session_id, prompt, "", start,
+                        retries=getattr(e, 'llm_retries', 0), error=str(e))
+            raise
+        record = self._record(session_id, prompt, str(result), start,
+                            retries=retries, queue_seconds=queue_seconds)
+        if call_stats is not None:
+            call_stats.update(record)
+        if cache:
+            cache.put(key, self.role, self.llm.model, str(result))
+        return result
+
+    def _stream_tokens(self, messages: List[Dict], prompt: str, usage: Dict) -> Iterator[str]:
+        """Yield non-empty response tokens from the model, filling usage when reported"""
+        if isinstance(self.llm, FakeLLM):
+            yield from self.llm.stream(prompt, self.role)
+            return
+
+        import litellm
+
+        for chunk in litellm.completion(
+            model=self.llm.model,
+            messages=messages,
+            api_key=self.llm.api_key,
+            stream=True,
+            stream_options={"include_usage": True}
+        ):
+            if getattr(chunk, "usage", None):
+                usage['prompt_tokens'] = chunk.usage.prompt_tokens
+                usage['completion_tokens'] = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    def stream_task(self,
+                    task: Task,
+                    use_cache: bool = True,
+                    session_id: Optional[str] = None,
+                    priority: int = INTERACTIVE,
+                    call_stats: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Execute a task as a single LLM call, yielding response tokens as they arrive.
+
+        Cached responses are yielded in one piece; fresh responses are stored
+        in the cache once the stream completes. The scheduler slot is held for
+        the whole stream. A transient failure before the first token is
+        retried like any other call; once part of the answer has been yielded
+        the stream fails instead, as the tokens cannot be taken back.
+        """
+        start = time.perf_counter()
+        prompt = f"{task.description}\n{task.expected_output}"
+        cache = get_llm_cache() if use_cache and LLM_CACHE_ENABLED else None
+        key = cache.make_key(self.role, self.llm.model, prompt) if cache else None
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                record = self._record(session_id, prompt, cached, start, cached=True, streamed=True)
+                if call_stats is not None:
+                    call_stats.update(record)
+                yield cached
+                return
+
+        messages = [
+            {
+                "role": "system",
+                "content": f"You are {self.role}. {self.backstory}\nYour goal: {self.goal}"
+            },
+            {
+                "role": "user",
+                "content": f"{task.description}\n\nExpected output: {task.expected_output}"
+            }
+        ]
+        scheduler = get_llm_scheduler()
+        chunks = []
+        usage = {}
+        queue_seconds = 0.0
+        attempt = 0
+        while True:
+            try:
+                with scheduler.slot(priority) as waited:
+                    queue_seconds += waited
+                    for token in self._stream_tokens(messages, prompt, usage):
+                        chunks.append(token)
+                        yield token
+                break
+            except Exception as e:
+                if chunks or not scheduler.should_retry(attempt, e):
+                    self._record(session_id, prompt, "".join(chunks), start, retries=attempt,
+                                queue_seconds=queue_seconds, streamed=True, error=str(e))
+                    e.llm_retries = attempt
+                    raise
+                error = e
+            scheduler.wait_to_retry(self.role, attempt, error)
+            attempt += 1
+        record = self._record(session_id, prompt, "".join(chunks), start, retries=attempt,
+                            queue_seconds=queue_seconds, streamed=True, usage=usage or None)
+        if call_stats is not None:
+            call_stats.update(record)
+
+        if cache:
+            cache.put(key, self.role, self.llm.model, "".join(chunks))
+
+_shared_agents: Dict[str, BaseAgent] = {}
+_shared_agents_lock = threading.Lock()
+_shared_data_manager: Optional[DataManager] = None
+
+
+def get_shared_agent(key: str) -> BaseAgent:
+    """Return the process-wide agent for a key of AGENT_SPECS, building it on first use"""
+    with _shared_agents_lock:
+        if key not in _shared_agents:
+            _shared_agents[key] = BaseAgent(**AGENT_SPECS[key])
+        return _shared_agents[key]
+
+
+def get_shared_data_manager() -> DataManager:
+    """Return a process-wide DataManager for read-only KPI lookups"""
+    global _shared_data_manager
+    with _shared_agents_lock:
+        if _shared_data_manager is None:
+            _shared_data_manager = DataManager()
+        return _shared_data_manager
+
+
+class SharedAgents(Mapping):
+    """Read-only view of the process-wide agents keyed like AGENT_SPECS"""
+
+    def __getitem__(self, key: str) -> BaseAgent:
+        if key not in AGENT_SPECS:
+            raise KeyError(key)
+        return get_shared_agent(key)
+
+    def __iter__(self):
+        return iter(AGENT_SPECS)
+
+    def __len__(self):
+        return len(AGENT_SPECS)
 
 class ESGAdvisorSystem:
     """Main ESG advisor system coordinating multiple agents"""
     
-    def __init__(self):
-        self.progress = ProgressTracker()
+    def __init__(self, use_cache: bool = True, session_id: Optional[str] = None):
+        # Progress elements only exist when created from a Streamlit script
+        self.progress = ProgressTracker(show_ui=in_script_thread())
+        self.use_cache = use_cache
+        # Stage checkpoints are scoped to this id and the KPI data hash
+        self.session_id = session_id or uuid.uuid4().hex
+        self.checkpoint_root = CHECKPOINT_DIR
+        # Chat sessions are interactive; background and batch runs set BATCH
+        self.priority = INTERACTIVE
+        # Whether the most recent run finished without an error
+        self.last_run_ok = False
+        self.data_manager = get_shared_data_manager()
         self.initialize_agents()
         
     def initialize_agents(self):
-        """Initialize specialized agents"""
-        self.agents = {
-            'data': BaseAgent(
-                role='ESG Data Processor',
-                goal='Process and validate ESG metrics',
-                backstory="""Expert in ESG data processing and validation, ensuring 
-                        data quality and standardization.""",
-                llm_type='analysis'
-            ),
-            
-            'environmental': BaseAgent(
-                role='Environmental Analyst',
-                goal='Analyze environmental performance',
-                backstory="""Specialist in environmental metrics, climate impact, 
-                        and sustainability practices.""",
-                llm_type='analysis'
-            ),
-            
-            'social': BaseAgent(
-                role='Social Impact Analyst',
-                goal='Analyze social performance',
-                backstory="""Expert in social metrics, workforce analytics, and 
-                        community impact assessment.""",
-                llm_type='analysis'
-            ),
-            
-            'governance': BaseAgent(
-                role='Governance Analyst',
-                goal='Analyze governance structure',
-                backstory="""Specialist in corporate governance, ethics, and 
-                        compliance frameworks.""",
-                llm_type='analysis'
-            ),
-            
-            'strategy': BaseAgent(
-                role='Strategy Developer',
-                goal='Develop improvement strategies',
-                backstory="""Expert in ESG strategy development and 
-                        implementation planning.""",
-                llm_type='strategy'
-            ),
-            
-            'communication': BaseAgent(
-                role='Communication Specialist',
-                goal='Present findings effectively',
-                backstory="""Specialist in presenting ESG information to 
-                        different stakeholders.""",
-                llm_type='chat'
+        """Attach the process-wide specialized agents; they are built on first use"""
+        self.agents = SharedAgents()
+
+    @property
+    def last_timings(self) -> RunTimings:
+        """Timings of the most recent (or current) run"""
+        return self.progress.timings
+
+    def _execute(self, key: str, task: Task) -> str:
+        """Run a task on an agent and record model time and queue wait separately"""
+        agent = self.agents[key]
+        call_stats = {}
+        start = time.perf_counter()
+        try:
+            return agent.execute_task(
+                task,
+                use_cache=self.use_cache,
+                session_id=self.session_id,
+                priority=self.priority,
+                call_stats=call_stats
+            )
+        finally:
+            queue_seconds = call_stats.get('queue_seconds', 0.0)
+            self.progress.timings.record_llm_call(
+                agent.role, agent.llm.model, time.perf_counter() - start - queue_seconds, queue_seconds
             )
-        }
-        
-    def process_data(self, data: Dict, industry: str) -> Dict:
-        """Process and validate input data"""
-        stage = AnalysisStage(
-            "Data Processing",
-            [
-                "Validating data structure",
-                "Checking completeness",
-                "Normalizing values",
-                "Identifying anomalies"
-            ],
-            self.progress
-        )
         
-        task = Task(
-            description=f"""
+    def _build_data_task(self, data: Dict, industry: str) -> Task:
+        """Build the data processing task"""
+        return Task(
+            description=render_prompt(f"""
                 Process and validate this ESG data from the {industry} industry:
-                {json.dumps(data, indent=2)}
+                {compact_json(data)}
                 
                 Steps:
                 1. Validate data structure and types
                 2. Check for missing or invalid values
-                3. Normalize metrics to standard ranges
-                4. Flag any anomalies or outliers
+                3. Flag any anomalies or outliers
                 
-                Return JSON with:
-                - Processed data
-                - Data quality metrics
-                - Identified issues
-                - Completeness score
-            """,
+                completeness is the share of usable values (0-100); issues are
+                missing or invalid values; summary is one or two sentences.
+                {DATA_SCHEMA.instructions()}
+            """, "data processing"),
             expected_output="Processed and validated ESG data",
             agent=self.agents['data'].agent
         )
-        
-        return stage.execute(lambda _: self.agents['data'].execute_task(task))
-        
-    def analyze_category(self, category: str, data: Dict, industry: str) -> Dict:
-        """Analyze specific ESG category"""
-        stage = AnalysisStage(
-            f"{category.title()} Analysis",
-            [
-                "Analyzing current performance",
-                "Comparing benchmarks",
-                "Identifying risks",
-                "Finding opportunities"
-            ],
-            self.progress
-        )
-        
-        task = Task(
-            description=f"""
-                Analyze {category} performance from the {industry} industry:
-                {json.dumps(data, indent=2)}
+
+    def slice_by_category(self, input_data: Dict, industry: str) -> Dict[str, Dict]:
+        """
+        Split a request payload into one payload per ESG category.
+
+        Each category payload carries only that category's KPI values, so
+        stage outputs depend on the KPI data alone and can be checkpointed.
+        """
+        category_map = self.data_manager.get_kpi_category_map(industry)
+        payloads = {category: {'kpis': {}} for category in ESG_CATEGORIES}
+        for kpi_name, value in input_data.get('data', {}).items():
+            category = category_map.get(kpi_name, '').lower()
+            if category in payloads:
+                if isinstance(value, dict) and 'value' in value:
+                    value = value['value']
+                payloads[category]['kpis'][kpi_name] = value
+        return payloads
+
+    def _build_category_task(self, category: str, data: Dict, industry: str, metrics: Dict) -> Task:
+        """
+        Build the analysis task for one ESG category
+
+        The agent is asked to interpret the precomputed benchmark metrics
+        instead of redoing the arithmetic; the metrics already carry each
+        KPI's value, so only KPIs without a benchmark are sent raw.
+        Definitions of the weakest KPIs are retrieved from the local
+        knowledge index.
+        """
+        kpis = metrics['kpis']
+        focus = sorted(kpis, key=lambda name: kpis[name]['position'])[:RETRIEVAL_TOP_K]
+        definitions = get_knowledge_index().context(" ".join(focus) or category, sources=('kpi',))
+        definitions_section = f"KPI definitions:\n{definitions}" if definitions else ""
+        unbenchmarked = {name: value for name, value in data.get('kpis', {}).items() if name not in kpis}
+        raw_section = f"Values without a benchmark: {compact_json(unbenchmarked)}" if unbenchmarked else ""
+        return Task(
+            description=render_prompt(f"""
+                Assess {category} performance of a company in the {industry} industry.
+                Benchmark metrics (computed, authoritative - do not recalculate;
+                position is 0 at the worst reference score and 100 at the best):
+                {compact_json(metrics)}
                 
-                Provide:
-                1. Performance assessment
-                2. Gap analysis
-                3. Risk evaluation
-                4. Improvement opportunities
+                {raw_section}
+                {definitions_section}
                 
-                Return detailed JSON analysis.
-            """,
-            expected_output=f"Detailed {category} analysis",
+                Write a short narrative interpreting these numbers: an overall
+                assessment, the key risks and the improvement opportunities.
+                {CATEGORY_SCHEMA.instructions()}
+            """, f"{category} analysis"),
+            expected_output=f"Concise {category} narrative grounded in the benchmark metrics",
             agent=self.agents[category].agent
         )
-        
-        return stage.execute(lambda _: self.agents[category].execute_task(task))
-        
-    def develop_strategy(self, analyses: Dict, industry: str) -> Dict:
-        """Develop comprehensive improvement strategy"""
-        stage = AnalysisStage(
-            "Strategy Development",
-            [
-                "Prioritizing improvements",
-                "Developing action plans",
-                "Creating timeline",
-                "Allocating resources"
-            ],
-            self.progress
-        )
-        
-        task = Task(
-            description=f"""
+
+    def _build_strategy_task(self,
+                            analyses: Dict,
+                            industry: str,
+                            data_quality: Optional[str] = None,
+                            metrics: Optional[Dict] = None) -> Task:
+        """Build the strategy development task"""
+        data_quality_section = f"Data quality notes:\n{data_quality}" if data_quality else ""
+        metrics_section = ""
+        if metrics is not None:
+            summary = {key: metrics[key] for key in ('overall_position', 'categories', 'worst_kpis')}
+            metrics_section = f"Benchmark summary (computed, authoritative):\n{compact_json(summary)}"
+        return Task(
+            description=render_prompt(f"""
                 Develop strategy based on analyses from the {industry} industry:
-                {json.dumps(analyses, indent=2)}
+                {compact_json(analyses)}
+                {metrics_section}
+                {data_quality_section}
                 
                 Create:
                 1. Prioritized improvements
@@ -213,19 +536,16 @@ class ESGAdvisorSystem:
                 4. Resource requirements
                 
                 Return detailed Markdown strategy.
-            """,
+            """, "strategy development"),
             expected_output="Comprehensive ESG strategy",
             agent=self.agents['strategy'].agent
         )
-        
-        return stage.execute(lambda _: self.agents['strategy'].execute_task(task))
-        
+
     def generate_report(self, 
-                    data: Dict, 
                     analyses: Dict, 
-                    strategy: Dict,
+                    strategy: Union[Dict, str],
                     industry: str) -> str:
-        """Generate final report"""
+        """Generate final report from the category analyses and the strategy"""
         stage = AnalysisStage(
             "Report Generation",
             [
@@ -238,11 +558,10 @@ class ESGAdvisorSystem:
         )
         
         task = Task(
-            description=f"""
+            description=render_prompt(f"""
                 Create comprehensive report from the {industry} industry using:
-                Processed Data: {json.dumps(data, indent=2)}
-                Analyses: {json.dumps(analyses, indent=2)}
-                Strategy: {json.dumps(strategy, indent=2)}
+                Analyses: {compact_json(analyses)}
+                Strategy: {compact_json(strategy)}
                 
                 Include:
                 1. Executive summary
@@ -251,31 +570,327 @@ class ESGAdvisorSystem:
                 4. Implementation roadmap
                 
                 Format as markdown with clear sections.
-            """,
+            """, "report generation"),
             expected_output="Complete ESG advisory report with the appropriate important data in a well structured manner",
             agent=self.agents['communication'].agent
         )
         
-        return stage.execute(lambda _: self.agents['communication'].execute_task(task))
+        return stage.execute(lambda: self._execute('communication', task))
         
-    def run_analysis(self, input_data: Dict, industry: str) -> str:
-        """Run complete ESG analysis pipeline"""
-        self.progress.init_tracking()
+    def _build_answer_task(self, input_data: Dict, outputs: Dict[str, Any], industry: str) -> Task:
+        """
+        Build the task answering a follow-up from existing stage outputs.
+
+        The analysis context is cut to ANSWER_CONTEXT_TOKENS (half for the
+        strategy, the rest shared by the categories) and the history comes
+        pre-bounded from ConversationMemory, so prompt size stays flat over
+        long chats. Up to RETRIEVAL_TOP_K reference snippets relevant to the
+        message are added from the local knowledge index.
+        """
+        message = input_data.get('question') or input_data.get('message', '')
+        if outputs:
+            category_budget = ANSWER_CONTEXT_TOKENS // (2 * len(ESG_CATEGORIES))
+            context = compact_json({
+                'strategy': fit_to_budget(outputs.get('strategy') or '', ANSWER_CONTEXT_TOKENS // 2),
+                'analyses': {
+                    category: fit_to_budget(
+                        compact_json(CATEGORY_SCHEMA.select(outputs.get(category) or {}, ('assessment', 'risks'))),
+                        category_budget
+                    )
+                    for category in ESG_CATEGORIES
+                }
+            })
+        else:
+            context = fit_to_budget(
+                input_data.get('context') or "No KPI data has been loaded yet.",
+                ANSWER_CONTEXT_TOKENS
+            )
+        history = input_data.get('history')
+        history_section = f"Conversation so far:\n{history}" if history else ""
+        references = get_knowledge_index().context(message) if message else ""
+        references_section = f"Reference material (KPI definitions and platform docs):\n{references}" if references else ""
+        return Task(
+            description=render_prompt(f"""
+                Answer this message from a company in the {industry} industry:
+                {message}
+                
+                {history_section}
+                
+                Use the existing ESG analysis where relevant:
+                {context}
+                
+                {references_section}
+                
+                Be concise and specific to their data.
+            """, "follow-up answer"),
+            expected_output="Direct answer to the user's message",
+            agent=self.agents['communication'].agent
+        )
+
+    def compute_metrics(self, input_data: Dict, industry: str) -> Dict:
+        """Deterministic benchmark metrics for the request's KPI data"""
+        return analyze_kpis(
+            input_data.get('data', {}),
+            self.data_manager.get_kpi_reference(),
+            self.data_manager.get_kpi_category_map(industry)
+        )
+
+    def build_pipeline(self, input_data: Dict, industry: str, include_strategy: bool = True) -> StagePipeline:
+        """
+        Model the analysis as a DAG: local benchmark metrics come first, data
+        processing and the category analyses run in parallel, and strategy
+        depends on all of them.
+
+        Args:
+            input_data (Dict): Request payload including the KPI data
+            industry (str): Selected industry
+            include_strategy (bool): Leave out the strategy stage when the
+                caller streams it separately
+        """
+        payloads = self.slice_by_category(input_data, industry)
+
+        def timed(label: str,
+                key: str,
+                build_task: Callable[[Dict[str, Any]], Task],
+                schema: Optional[StageSchema] = None) -> Callable[[Dict[str, Any]], Any]:
+            def run(inputs: Dict[str, Any]) -> Any:
+                with self.progress.timings.stage(label):
+                    output = self._execute(key, build_task(inputs))
+                    return schema.parse(output) if schema else output
+            return run
+
+        def run_metrics(_inputs: Dict[str, Any]) -> Dict:
+            with self.progress.timings.stage("Benchmark Metrics"):
+                return self.compute_metrics(input_data, industry)
+
+        stages = [
+            PipelineStage(
+                'metrics',
+                run_metrics,
+                label="Benchmark Metrics",
+                render=analytics_markdown
+            ),
+            PipelineStage(
+                'data',
+                timed("Data Processing", 'data',
+                    lambda _inputs: self._build_data_task(input_data.get('data', {}), industry),
+                    schema=DATA_SCHEMA),
+                label="Data Processing",
+                render=DATA_SCHEMA.to_markdown
+            )
+        ]
+        for category in ESG_CATEGORIES:
+            label = f"{category.title()} Analysis"
+            stages.append(PipelineStage(
+                category,
+                timed(label, category,
+                    lambda inputs, category=category: self._build_category_task(
+                        category,
+                        payloads[category],
+                        industry,
+                        metrics=category_view(inputs['metrics'], category)
+                    ),
+                    schema=CATEGORY_SCHEMA),
+                depends_on=['metrics'],
+                label=label,
+                render=CATEGORY_SCHEMA.to_markdown
+            ))
+        if include_strategy:
+            stages.append(PipelineStage(
+                'strategy',
+                timed("Strategy Development", 'strategy',
+                    lambda inputs: self._build_strategy_task_from_outputs(inputs, industry)),
+                depends_on=['metrics', 'data', *ESG_CATEGORIES],
+                label="Strategy Development"
+            ))
+        return StagePipeline(stages)
+
+    def _build_strategy_task_from_outputs(self, outputs: Dict[str, Any], industry: str) -> Task:
+        """Build the strategy task from the parsed outputs of the earlier pipeline stages"""
+        return self._build_strategy_task(
+            {category: outputs[category] for category in ESG_CATEGORIES},
+            industry,
+            data_quality=compact_json(DATA_SCHEMA.select(outputs['data'], ('completeness', 'issues', 'anomalies'))),
+            metrics=outputs['metrics']
+        )
+
+    def checkpoint_for(self, input_data: Dict, industry: str) -> StageCheckpoint:
+        """Checkpoint of this session's stage outputs for the request's KPI data"""
+        return StageCheckpoint(
+            self.session_id,
+            hash_kpi_data(input_data.get('data', {}), industry),
+            root=self.checkpoint_root
+        )
+
+    def _run_stages(self,
+                    pipeline: StagePipeline,
+                    checkpoint: StageCheckpoint,
+                    on_stage_complete: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Run a pipeline, reporting progress on the script thread"""
+        def started(stage: PipelineStage):
+            self.progress.update_status(stage.label, "Running")
+
+        def completed(stage: PipelineStage, output: Any, from_checkpoint: bool):
+            self.progress.complete_step(stage.label, "Reused checkpoint" if from_checkpoint else "Complete")
+            if not from_checkpoint:
+                self.progress.show_thought(f"Finished: {stage.label}")
+                if on_stage_complete:
+                    on_stage_complete(stage.label, stage.render(output) if stage.render else output)
+
+        return pipeline.run(
+            checkpoint,
+            reuse=self.use_cache,
+            max_workers=len(pipeline.stages),
+            on_stage_start=started,
+            on_stage_complete=completed
+        )
+
+    def run_analysis(self, input_data: Dict, industry: str, use_cache: Optional[bool] = None) -> str:
+        """
+        Run complete ESG analysis pipeline
+
+        Completed stages are checkpointed per session and KPI data, so a retry
+        after a failure resumes from the failed stage and follow-up questions
+        reuse the existing outputs.
+
+        Args:
+            input_data (Dict): Request payload including the KPI data
+            industry (str): Selected industry
+            use_cache (bool): Override the system's cache setting for this run;
+                False forces fresh LLM calls for every stage
+        """
+        default_use_cache = self.use_cache
+        if use_cache is not None:
+            self.use_cache = use_cache
+        follow_up = input_data.get('type') in FOLLOW_UP_TYPES
+        pipeline = self.build_pipeline(input_data, industry)
+        self.progress.init_tracking(total_steps=len(pipeline.stages) + int(follow_up))
+        self.last_run_ok = False
         
         try:
-            processed_data = self.process_data(input_data,industry)
-            
-            analyses = {
-                category: self.analyze_category(category, processed_data,industry)
-                for category in ['environmental', 'social', 'governance']
-            }
-            
-            strategy = self.develop_strategy(analyses,industry)
-            self.progress.clear()
-            return strategy
+            outputs = {}
+            if input_data.get('data') or not follow_up:
+                outputs = self._run_stages(pipeline, self.checkpoint_for(input_data, industry))
+            if not follow_up:
+                self.last_run_ok = True
+                return outputs['strategy']
+
+            with self.progress.timings.stage("Answer"):
+                answer = self._execute('communication', self._build_answer_task(input_data, outputs, industry))
+            self.progress.complete_step("Answer")
+            self.last_run_ok = True
+            return answer
             
         except Exception as e:
-            self.progress.clear()
-            st.error(f"Analysis failed: {str(e)}")
+            self.progress.error(f"Analysis failed: {str(e)}")
             return "Analysis could not be completed due to an error."
 
+        finally:
+            self.progress.timings.finish()
+            self.progress.clear()
+            self.use_cache = default_use_cache
+
+    def run_report(self, input_data: Dict, industry: str) -> str:
+        """
+        Run the full pipeline and write the advisory report, for batch jobs
+
+        The report is checkpointed with the stages, so a rerun after a crash
+        only repeats the work that had not finished.
+
+        Raises:
+            Exception: The first stage or report failure
+        """
+        pipeline = self.build_pipeline(input_data, industry)
+        self.progress.init_tracking(total_steps=len(pipeline.stages) + 1)
+        try:
+            checkpoint = self.checkpoint_for(input_data, industry)
+            outputs = self._run_stages(pipeline, checkpoint)
+            report = checkpoint.get('report')
+            if report is None:
+                report = self.generate_report(
+                    {category: outputs[category] for category in ESG_CATEGORIES},
+                    outputs['strategy'],
+                    industry
+                )
+                checkpoint.put('report', report)
+            return report
+        finally:
+            self.progress.timings.finish()
+            self.progress.clear()
+
+    def stream_analysis(self,
+                        input_data: Dict,
+                        industry: str,
+                        on_stage_complete: Optional[Callable[[str, str], None]] = None) -> Iterator[str]:
+        """
+        Run the analysis pipeline, streaming the final response token by token.
+
+        Earlier stages are surfaced through on_stage_complete as soon as each
+        one finishes, so the user sees results long before the strategy is done.
+        Stages already checkpointed for this session and KPI data are reused;
+        follow-up questions stream an answer built from them.
+
+        Args:
+            input_data (Dict): Request payload including the KPI data
+            industry (str): Selected industry
+            on_stage_complete (Callable): Called with (stage name, output) per finished stage
+
+        Yields:
+            str: Strategy or answer text chunks
+        """
+        follow_up = input_data.get('type') in FOLLOW_UP_TYPES
+        # A fresh strategy is streamed below; follow-ups need it as context first
+        pipeline = self.build_pipeline(input_data, industry, include_strategy=follow_up)
+        checkpoint = self.checkpoint_for(input_data, industry)
+        self.progress.init_tracking(total_steps=len(pipeline.stages) + 1)
+        self.last_run_ok = False
+        try:
+            outputs = {}
+            if input_data.get('data') or not follow_up:
+                outputs = self._run_stages(pipeline, checkpoint, on_stage_complete)
+
+            if follow_up:
+                label, agent_key = "Answer", 'communication'
+                task = self._build_answer_task(input_data, outputs, industry)
+            else:
+                label, agent_key = "Strategy Development", 'strategy'
+                cached_strategy = checkpoint.get('strategy') if self.use_cache else None
+                if cached_strategy is not None:
+                    self.progress.complete_step(label, "Reused checkpoint")
+                    self.progress.clear()
+                    self.last_run_ok = True
+                    yield cached_strategy
+                    return
+                task = self._build_strategy_task_from_outputs(outputs, industry)
+
+            self.progress.update_status(label, "Writing response")
+            agent = self.agents[agent_key]
+            chunks = []
+            call_stats = {}
+            start = time.perf_counter()
+            with self.progress.timings.stage(label):
+                for token in agent.stream_task(task,
+                                            use_cache=self.use_cache,
+                                            session_id=self.session_id,
+                                            priority=self.priority,
+                                            call_stats=call_stats):
+                    if not chunks:
+                        self.progress.clear()
+                    chunks.append(token)
+                    yield token
+            queue_seconds = call_stats.get('queue_seconds', 0.0)
+            self.progress.timings.record_llm_call(
+                agent.role, agent.llm.model, time.perf_counter() - start - queue_seconds, queue_seconds
+            )
+            self.progress.complete_step(label)
+            if not follow_up:
+                checkpoint.put('strategy', "".join(chunks))
+            self.last_run_ok = True
+
+        except Exception as e:
+            self.progress.error(f"Analysis failed: {str(e)}")
+            yield "Analysis could not be completed due to an error."
+
+        finally:
+            self.progress.timings.finish()
+            self.progress.clear()
@@ -0,0 +1,240 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterator, Optional
+
+import numpy as np
+
+from utils.embedding_backends import EmbeddingBackend, create_backend
+from utils.embedding_cache import normalize_text
+from utils.vector_index import BruteForceVectorIndex
+
+ANSWER_STORE_PATH = os.path.join("session_files", "answer_store.sqlite3")
+# Set ESG_ANSWER_REUSE=off to always run the agents for questions
+ANSWER_REUSE_ENABLED = os.getenv("ESG_ANSWER_REUSE", "on").lower() not in ("0", "off", "false", "no")
+# Cosine similarity a past question needs to be offered for a new one
+SIMILARITY_THRESHOLD = float(os.getenv("ESG_ANSWER_SIMILARITY", "0.9"))
+# Nearest stored questions checked for matching guard terms
+CANDIDATES = 5
+# Answers older than this are neither offered nor kept
+MAX_AGE_DAYS = float(os.getenv("ESG_ANSWER_MAX_AGE_DAYS", "7"))
+MAX_ENTRIES_PER_INDUSTRY = 500
+# hashed-tfidf needs no model download; sentence-transformer matches paraphrases better
+ANSWER_EMBEDDING_BACKEND = os.getenv("ESG_ANSWER_EMBEDDING_BACKEND", "hashed-tfidf")
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "could", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "should", "so", "that",
+    "the", "this", "to", "us", "we", "what", "which", "why", "with", "would", "you", "your"
+}
+
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9'’]*")
+_NEGATIONS = {"not", "no", "never", "without", "none", "nor", "cannot"}
+
+
+def guard_terms(question: str) -> FrozenSet[str]:
+    """
+    Terms two questions must share exactly to reuse an answer.
+
+    Negations, numbers (scope 1 vs scope 2) and named entities (capitalized
+    words after the first, and acronyms) change the meaning of a question
+    far more than their weight in a lexical embedding suggests.
+    """
+    guards = set()
+    for position, word in enumerate(_WORD_PATTERN.findall(normalize_text(question))):
+        plain = re.sub(r"['’]", "", word).lower()
+        if plain in _NEGATIONS or word.lower().endswith(("n't", "n’t")):
+            guards.add("not")
+        elif any(char.isdigit() for char in word):
+            guards.add(plain)
+        elif word.isupper() and len(word) > 1 or (position > 0 and word[0].isupper()):
+            guards.add(plain)
+    return frozenset(guards)
+
+
+def question_terms(question: str) -> str:
+    """
+    Content words of a question, lower-cased with plural s stripped.
+
+    Question phrasing ("how can we", "what should our") would otherwise
+    dominate a lexical embedding of a short question.
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(normalize_text(question).lower()):
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        if token not in _STOPWORDS:
+            terms.append(token)
+    return " ".join(terms)
+
+
+def _idf_corpus():
+    """KPI and platform texts used to fit the hashed TF-IDF weights"""
+    from agent.knowledge_index import get_knowledge_index
+    return [f"{title} {text}" for _, title, text in get_knowledge_index().documents]
+
+
+class AnswerStore:
+    """
+    Past advisor answers shared across sessions, looked up by question similarity.
+
+    Answers are stored per industry and context with the embedding of their
+    question. The context is a hash of the KPI data the answer was grounded
+    in, or empty for answers given without company data, so one company's
+    figures and advice are never offered to another. A new question is
+    matched against the fresh answers of its industry and context embedded
+    with the same model; the closest one that reaches the similarity
+    threshold and has the same guard terms is returned. Stale and excess
+    entries are pruned on write.
+    """
+
+    def __init__(self,
+                path: str = ANSWER_STORE_PATH,
+                threshold: float = SIMILARITY_THRESHOLD,
+                max_age_days: float = MAX_AGE_DAYS,
+                max_entries: int = MAX_ENTRIES_PER_INDUSTRY,
+                backend: Optional[EmbeddingBackend] = None):
+        self.path = path
+        self.threshold = threshold
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self._backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(answers)")}
+            if columns and "context" not in columns:
+                # Entries from before the context key may hold another company's data
+                conn.execute("DROP TABLE answers")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    industry TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    model_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_lookup ON answers (industry, context, model_id, created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        with self._lock:
+            if self._backend is None:
+                corpus = _idf_corpus() if ANSWER_EMBEDDING_BACKEND == "hashed-tfidf" else None
+                self._backend = create_backend(ANSWER_EMBEDDING_BACKEND, corpus=corpus)
+            return self._backend
+
+    def _embed(self, question: str) -> np.ndarray:
+        return self.backend.encode([question_terms(question)])[0].astype(np.float32)
+
+    def lookup(self, industry: str, question: str, context: str = "") -> Optional[Dict]:
+        """
+        Most similar fresh answer for a question, if it reaches the threshold.
+
+        Args:
+            industry (str): Selected industry
+            question (str): User question
+            context (str): Hash of the session's KPI data, or "" without data
+
+        Returns:
+            Dict: question, answer, similarity and age_seconds of the match,
+                or None
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, question, embedding, answer, created_at FROM answers "
+                    "WHERE industry = ? AND context = ? AND model_id = ? AND created_at >= ?",
+                    (industry, context, self.backend.model_id, now - self.max_age_seconds)
+                ).fetchall()
+                match = None
+                if rows:
+                    index = BruteForceVectorIndex(np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows]))
+                    indices, similarities = index.search(self._embed(question), CANDIDATES)
+                    guards = guard_terms(question)
+                    for position, similarity in zip(indices, similarities):
+                        row = rows[position]
+                        if similarity < self.threshold:
+                            break
+                        if guard_terms(row[1]) != guards:
+                            continue
+                        conn.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (row[0],))
+                        match = {
+                            'question': row[1],
+                            'answer': row[3],
+                            'similarity': float(similarity),
+                            'age_seconds': now - row[4]
+                        }
+                        break
+        except sqlite3.Error as e:
+            logging.warning(f"Answer store lookup failed: {str(e)}")
+            match = None
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return match
+
+    def put(self, industry: str, question: str, answer: str, context: str = ""):
+        """Store an answer under its KPI data context and prune stale and excess entries of the industry"""
+        now = time.time()
+        model_id = self.backend.model_id
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO answers (industry, context, model_id, question, embedding, answer, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (industry, context, model_id, question, self._embed(question).tobytes(), answer, now)
+                )
+                conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.max_age_seconds,))
+                conn.execute("""
+                    DELETE FROM answers WHERE industry = ? AND id NOT IN (
+                        SELECT id FROM answers WHERE industry = ? ORDER BY created_at DESC LIMIT ?
+                    )
+                """, (industry, industry, self.max_entries))
+        except sqlite3.Error as e:
+            logging.warning(f"Answer store write failed: {str(e)}")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers")
+
+
+_answer_store = None
+_answer_store_lock = threading.Lock()
+
+
+def get_answer_store() -> AnswerStore:
+    """Return the process-wide answer store"""
+    global _answer_store
+    with _answer_store_lock:
+        if _answer_store is None:
+            _answer_store = AnswerStore()
+        return _answer_store
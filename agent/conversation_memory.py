@@ -0,0 +1,133 @@
+import re
+from collections import deque
+from typing import List
+
+from agent.prompt_utils import estimate_tokens, fit_to_budget
+
+# Turns (one user or assistant message each) kept verbatim
+RECENT_TURNS = 6
+# Token budget for the whole rendered history, and the summary's share of it
+HISTORY_TOKEN_BUDGET = 1200
+SUMMARY_TOKEN_BUDGET = 400
+# Longest gist kept per summarized turn
+GIST_TOKENS = 40
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_MARKDOWN_NOISE = re.compile(r"[#*_`>|]+")
+_HEADING = re.compile(r"^#{1,6}\s")
+_RULE = re.compile(r"^([-*_=]\s*){3,}$")
+_LIST_ITEM = re.compile(r"^(?:[-*+]|\d+[.)])\s+(.*)$")
+# A line that is only a bold title, e.g. "**Prioritized Improvements**"
+_TITLE = re.compile(r"^\*\*[^*]+\*\*:?$")
+
+
+def _first_sentence(text: str) -> str:
+    plain = " ".join(_MARKDOWN_NOISE.sub(" ", text).split())
+    plain = re.sub(r"\s+([:;,.!?])", r"\1", plain)
+    return _SENTENCE_END.split(plain, maxsplit=1)[0].rstrip(".")
+
+
+def _gist(text: str) -> str:
+    """
+    Extractive gist of a message, capped at GIST_TOKENS.
+
+    Headings, titles and rules are skipped. The gist is the first prose
+    sentence, then the first sentence of each top-level list item, then the
+    body rows of any table, so structured answers keep their content.
+    """
+    prose, items, rows = None, [], []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or _HEADING.match(stripped) or _RULE.match(stripped) or _TITLE.match(stripped):
+            continue
+        if stripped.startswith("|"):
+            cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+            # Separator rows like |---|:--:| carry no content
+            if not all(set(cell) <= set("-: ") for cell in cells):
+                rows.append(" ".join(_first_sentence(cell) for cell in cells if cell))
+            continue
+        item = _LIST_ITEM.match(stripped)
+        if item:
+            # Nested items are details of the item above them
+            if line[:1].isspace():
+                continue
+            items.append(_first_sentence(item.group(1)))
+        elif prose is None:
+            prose = _first_sentence(stripped)
+    parts = [prose] if prose else []
+    parts += items
+    # The first table row is the header
+    parts += rows[1:] if len(rows) > 1 else rows
+    return fit_to_budget("; ".join(part for part in parts if part), GIST_TOKENS)
+
+
+class ConversationMemory:
+    """
+    Bounded chat history for prompts.
+
+    The last recent_turns messages are kept verbatim. Older messages are
+    folded into a rolling extractive summary (one short gist per message,
+    built from its prose, list items and table rows; oldest gists dropped
+    first), so the rendered history never exceeds
+    token_budget however long the chat runs.
+    """
+
+    def __init__(self,
+                recent_turns: int = RECENT_TURNS,
+                token_budget: int = HISTORY_TOKEN_BUDGET,
+                summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.recent = deque()
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summary: List[str] = []
+
+    def add(self, role: str, content: str):
+        """Append a message, summarizing the oldest verbatim turn when over the limit"""
+        self.recent.append((role, str(content)))
+        while len(self.recent) > self.recent_turns:
+            self._summarize(*self.recent.popleft())
+
+    def _summarize(self, role: str, content: str):
+        speaker = "User" if role == "user" else "Advisor"
+        self.summary.append(f"- {speaker}: {_gist(content)}")
+        while self.summary and estimate_tokens("\n".join(self.summary)) > self.summary_budget:
+            self.summary.pop(0)
+
+    def render(self) -> str:
+        """
+        History for a prompt within the token budget.
+
+        Verbatim turns share what the summary leaves of the budget, newest
+        first; turns that do not fit are shown as their gist instead.
+        """
+        sections = []
+        if self.summary:
+            sections.append("Earlier in the conversation:\n" + "\n".join(self.summary))
+        remaining = self.token_budget - estimate_tokens("\n".join(sections))
+
+        turns = []
+        for role, content in reversed(self.recent):
+            speaker = "User" if role == "user" else "Advisor"
+            line = f"{speaker}: {content}"
+            if estimate_tokens(line) > remaining:
+                line = f"{speaker}: {_gist(content)}"
+            if estimate_tokens(line) > remaining:
+                break
+            turns.append(line)
+            remaining -= estimate_tokens(line)
+        if turns:
+            sections.append("Recent messages:\n" + "\n".join(reversed(turns)))
+        return "\n\n".join(sections)
+
+    def remove_last(self, count: int = 1):
+        """Forget the newest verbatim messages, e.g. an exchange that is being regenerated"""
+        for _ in range(min(count, len(self.recent))):
+            self.recent.pop()
+
+    def clear(self):
+        self.recent.clear()
+        self.summary.clear()
+
+    def __len__(self):
+        return len(self.recent) + len(self.summary)
@@ -0,0 +1,92 @@
+"""
+Deterministic stand-in for the Gemini clients, for load and regression tests.
+
+Enable it with ESG_LLM_BACKEND=fake. Every response is derived from a hash
+of the prompt, so identical prompts always get identical outputs, and each
+call waits ESG_FAKE_LLM_LATENCY seconds (plus up to ESG_FAKE_LLM_JITTER
+seconds, also derived from the prompt) to mimic model time.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Iterator
+
+LLM_BACKEND = os.getenv("ESG_LLM_BACKEND", "gemini").lower()
+FAKE_LATENCY_SECONDS = float(os.getenv("ESG_FAKE_LLM_LATENCY", "0.2"))
+FAKE_JITTER_SECONDS = float(os.getenv("ESG_FAKE_LLM_JITTER", "0"))
+FAKE_STREAM_CHUNK_WORDS = 8
+
+
+class FakeLLM:
+    """
+    Fake LLM client returning canned, role-specific structured outputs.
+
+    Args:
+        model_type (str): Model type as passed to create_llm
+        latency_seconds (float): Base delay per call
+        jitter_seconds (float): Maximum extra delay, chosen per prompt
+    """
+
+    def __init__(self,
+                model_type: str,
+                latency_seconds: float = FAKE_LATENCY_SECONDS,
+                jitter_seconds: float = FAKE_JITTER_SECONDS):
+        self.model_type = model_type
+        self.model = f"fake/{model_type}"
+        self.api_key = None
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+
+    @staticmethod
+    def _digest(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _delay(self, digest: str) -> float:
+        fraction = int(digest[:8], 16) / 0xFFFFFFFF
+        return self.latency_seconds + self.jitter_seconds * fraction
+
+    def _respond(self, prompt: str, role: str, digest: str) -> str:
+        score = int(digest[8:10], 16) / 255
+        role_lower = role.lower()
+        if "data" in role_lower:
+            return json.dumps({
+                "completeness": round(60 + 40 * score, 1),
+                "issues": ["Some KPIs lack a reporting period"],
+                "anomalies": [],
+                "summary": "Data is mostly complete and within expected ranges."
+            })
+        if "analyst" in role_lower:
+            return json.dumps({
+                "assessment": f"{role} rating {score:.2f}; below the best reference on one KPI",
+                "risks": ["Regulatory disclosure risk"],
+                "opportunities": ["Set a time-bound reduction target"]
+            })
+        if "strategy" in role_lower:
+            return (
+                "## Prioritized Improvements\n"
+                f"1. Close the largest KPI gap (priority score {score:.2f})\n"
+                "2. Improve data completeness\n\n"
+                "## Action Plan\n- Assign owners per KPI\n- Publish quarterly progress\n\n"
+                "## Timeline\n- Q1: baseline\n- Q2-Q4: implementation\n\n"
+                "## Resources\n- One sustainability analyst\n"
+            )
+        return f"Based on the analysis, focus first on the weakest category (ref {digest[:6]})."
+
+    def call(self, prompt: str, role: str = "") -> str:
+        """Return the canned response for prompt after the simulated latency"""
+        digest = self._digest(prompt)
+        time.sleep(self._delay(digest))
+        return self._respond(prompt, role, digest)
+
+    def stream(self, prompt: str, role: str = "") -> Iterator[str]:
+        """Yield the canned response in word chunks, spreading the latency across them"""
+        digest = self._digest(prompt)
+        words = self._respond(prompt, role, digest).split(" ")
+        chunks = [" ".join(words[i:i + FAKE_STREAM_CHUNK_WORDS])
+                for i in range(0, len(words), FAKE_STREAM_CHUNK_WORDS)]
+        pause = self._delay(digest) / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            time.sleep(pause)
+            yield chunk if i == len(chunks) - 1 else chunk + " "
+
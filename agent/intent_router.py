@@ -0,0 +1,261 @@
+import json
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.kpi_scoring import kpi_value, normalize_kpi_value, numeric_kpi_value
+
+KPI_SPECS_PATH = 'data/kpis.json'
+KPI_REFERENCE_PATH = 'data/kpi_reference.json'
+
+# Intents answered by the agents; the others are answered locally
+AGENT_INTENTS = ('analysis_request', 'question', 'chat')
+
+# A KPI counts as mentioned when the prompt covers this share of its
+# IDF-weighted name tokens; runner-up KPIs must reach this share of the best
+MIN_MENTION_COVERAGE = 0.3
+MENTION_RATIO = 0.8
+MAX_MENTIONS = 5
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "our", "p", "pa", "per", "please", "show", "the",
+    "to", "we", "what", "which", "with", "you", "your"
+}
+_CATEGORIES = ('environmental', 'social', 'governance')
+
+_ANALYSIS_PATTERN = re.compile(
+    r"\b(analy[sz]e|analysis|evaluate|assess|strateg\w*|recommend\w*|improve\w*|plan|priorit\w*)\b")
+# Open-ended wording always goes to the agents, even when a lookup phrase matches
+_OPEN_ENDED_PATTERN = re.compile(r"\b(why|how|should|explain\w*|recommend\w*)\b")
+# Local answers need an explicit lookup phrase
+_SCORE_PATTERN = re.compile(r"\b(scores?|scoring|rating|rated|grade)\b")
+_DEFINITION_PATTERN = re.compile(
+    r"\b(what (is|are|does)|define|definition|meaning of|calculated|calculation|formula|units?)\b")
+_POSSESSIVE_PATTERN = re.compile(r"\b(my|our)\b")
+_DATA_PATTERN = re.compile(
+    r"\b((my|our) ([a-z]+ )?(data|kpis?|metrics?|numbers|figures)|kpi data)\b")
+_OWN_VALUE_PATTERN = re.compile(r"\bwhat (is|are|was|were) (my|our)\b")
+_QUESTION_PATTERN = re.compile(r"\b(what|when|where|who|which)\b|\?")
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        if len(token) > 1 and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class IntentRouter:
+    """
+    Rules-based router for chat prompts.
+
+    Data lookups, score lookups and KPI definitions are answered directly
+    from the session's KPI data, data/kpis.json and data/kpi_reference.json;
+    only open-ended analysis and questions are routed to the agents.
+    """
+
+    def __init__(self, kpi_specs: Dict, kpi_reference: Dict):
+        self.kpi_specs = kpi_specs
+        self.kpi_reference = kpi_reference
+        self._kpi_tokens = {name: set(_tokens(name)) for name in list(kpi_specs) + list(kpi_reference)}
+        document_frequency: Dict[str, int] = {}
+        for tokens in self._kpi_tokens.values():
+            for token in tokens:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        total = len(self._kpi_tokens)
+        self._idf = {
+            token: math.log((1 + total) / (1 + count)) + 1
+            for token, count in document_frequency.items()
+        }
+        # Tokens never seen in a KPI name are treated as the rarest
+        self._max_idf = math.log(1 + total) + 1
+
+    @classmethod
+    def from_files(cls,
+                specs_path: str = KPI_SPECS_PATH,
+                reference_path: str = KPI_REFERENCE_PATH) -> "IntentRouter":
+        with open(specs_path, 'r', encoding='utf-8') as f:
+            kpi_specs = json.load(f)
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            kpi_reference = json.load(f)
+        return cls(kpi_specs, kpi_reference)
+
+    def find_kpis(self, prompt: str, candidates: Optional[List[str]] = None) -> List[str]:
+        """
+        KPIs mentioned in a prompt, best match first.
+
+        Args:
+            prompt (str): User message
+            candidates (List[str]): Restrict matching to these KPI names
+
+        Returns:
+            List[str]: Matching KPI names
+        """
+        prompt_tokens = set(_tokens(prompt))
+        scored = []
+        for name in candidates or self._kpi_tokens:
+            tokens = self._kpi_tokens.get(name)
+            if tokens is None:
+                tokens = set(_tokens(name))
+            overlap = tokens & prompt_tokens
+            if not overlap:
+                continue
+            idf = lambda token: self._idf.get(token, self._max_idf)
+            coverage = sum(map(idf, overlap)) / sum(map(idf, tokens))
+            scored.append((coverage, name))
+        if not scored:
+            return []
+        scored.sort(reverse=True)
+        best = scored[0][0]
+        if best < MIN_MENTION_COVERAGE:
+            return []
+        return [name for coverage, name in scored[:MAX_MENTIONS] if coverage >= best * MENTION_RATIO]
+
+    def classify(self, prompt: str, mentions: List[str]) -> str:
+        """
+        Classify a prompt into an intent.
+
+        Only explicit lookups ("what is my score for X", "show my KPI data",
+        "what is X") are answered locally; anything open-ended goes to the
+        agents.
+
+        Returns:
+            str: 'analysis_request', 'score_lookup', 'definition', 'data_request',
+                'question' or 'chat'
+        """
+        text = prompt.lower()
+        if _ANALYSIS_PATTERN.search(text):
+            return 'analysis_request'
+        if _OPEN_ENDED_PATTERN.search(text):
+            return 'question'
+        if _SCORE_PATTERN.search(text):
+            return 'score_lookup'
+        if mentions and _DEFINITION_PATTERN.search(text) and not _POSSESSIVE_PATTERN.search(text):
+            return 'definition'
+        if _DATA_PATTERN.search(text) or (mentions and _OWN_VALUE_PATTERN.search(text)):
+            return 'data_request'
+        if _QUESTION_PATTERN.search(text):
+            return 'question'
+        return 'chat'
+
+    def route(self,
+            prompt: str,
+            kpi_data: Dict,
+            category_map: Optional[Dict[str, str]] = None) -> Tuple[str, Optional[str]]:
+        """
+        Classify a prompt and answer it locally when possible.
+
+        Args:
+            prompt (str): User message
+            kpi_data (Dict): Session KPI values keyed by KPI name
+            category_map (Dict[str, str]): ESG category per KPI name
+
+        Returns:
+            tuple: (intent, answer); answer is None for AGENT_INTENTS
+        """
+        mentions = self.find_kpis(prompt)
+        intent = self.classify(prompt, mentions)
+        if intent in AGENT_INTENTS:
+            return intent, None
+
+        if intent == 'definition':
+            return intent, self._definition_answer(mentions)
+
+        if not kpi_data:
+            return intent, ("I don't see any KPI data loaded yet. Please enter your ESG metrics "
+                "on the KPI page first.")
+
+        selected = self._select_kpis(prompt, kpi_data, category_map)
+        if intent == 'score_lookup':
+            return intent, self._score_answer(selected, kpi_data, category_map)
+        return intent, self._data_answer(selected, kpi_data, category_map)
+
+    def _select_kpis(self, prompt: str, kpi_data: Dict, category_map: Optional[Dict[str, str]]) -> List[str]:
+        """KPIs of the session the prompt refers to: named KPIs, a category, or all"""
+        mentioned = self.find_kpis(prompt, list(kpi_data))
+        if mentioned:
+            return mentioned
+        text = prompt.lower()
+        categories = [c for c in _CATEGORIES if c in text]
+        if categories and category_map:
+            return [name for name in kpi_data
+                    if category_map.get(name, '').lower() in categories]
+        return list(kpi_data)
+
+    def _definition_answer(self, kpi_names: List[str]) -> str:
+        sections = []
+        for name in kpi_names:
+            spec = self.kpi_specs.get(name, {})
+            reference = self.kpi_reference.get(name, {})
+            lines = [f"**{name}**"]
+            if spec.get('unit_of_measurement'):
+                lines.append(f"- Unit: {spec['unit_of_measurement']}")
+            if spec.get('calculation_logic'):
+                lines.append(f"- Calculation: {spec['calculation_logic']}")
+            if spec.get('required_data'):
+                inputs = "; ".join(f"{item['name']} ({item['description']})" for item in spec['required_data'])
+                lines.append(f"- Required data: {inputs}")
+            if spec and not spec.get('is_numerical', True):
+                lines.append("- Type: narrative answer, scored against reference responses")
+            if reference:
+                lines.append(f"- Benchmark: best {reference.get('best_score')}, "
+                            f"worst {reference.get('worst_score')} {reference.get('unit', '')}".rstrip())
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
+
+    def _score_answer(self, kpi_names: List[str], kpi_data: Dict, category_map: Optional[Dict[str, str]]) -> str:
+        rows, by_category = [], {}
+        for name in kpi_names:
+            value = numeric_kpi_value(kpi_data[name])
+            if value is None or name not in self.kpi_reference:
+                continue
+            score, _, unit = normalize_kpi_value(name, value, self.kpi_reference)
+            rows.append(f"| {name} | {score:.0f} | {value:g} {unit} |")
+            category = (category_map or {}).get(name)
+            if category:
+                by_category.setdefault(category, []).append(score)
+        if not rows:
+            return ("None of those KPIs has a numeric value with a benchmark, so I can't score them. "
+                "Ask me to analyze your data for a qualitative assessment.")
+
+        lines = []
+        if by_category:
+            summary = ", ".join(f"{category} {sum(scores) / len(scores):.0f}"
+                                for category, scores in sorted(by_category.items()))
+            lines.append(f"**Category scores (0-100):** {summary}\n")
+        lines += ["| KPI | Score (0-100) | Value |", "|---|---:|---|"] + rows
+        return "\n".join(lines)
+
+    def _data_answer(self, kpi_names: List[str], kpi_data: Dict, category_map: Optional[Dict[str, str]]) -> str:
+        count = f"{len(kpi_names)} KPI{'s' if len(kpi_names) != 1 else ''}"
+        lines = [f"**Your KPI data** ({count})\n",
+                "| KPI | Category | Value | Status |", "|---|---|---|---|"]
+        for name in kpi_names:
+            entry = kpi_data[name]
+            value = kpi_value(entry)
+            numeric = numeric_kpi_value(entry)
+            unit = self.kpi_reference.get(name, {}).get('unit', '')
+            shown = f"{numeric:g} {unit}".rstrip() if numeric is not None else str(value)
+            status = entry.get('status', '') if isinstance(entry, dict) else ''
+            category = (category_map or {}).get(name, '')
+            lines.append(f"| {name} | {category} | {shown} | {status} |")
+        return "\n".join(lines)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Return the process-wide intent router"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = IntentRouter.from_files()
+        return _router
@@ -0,0 +1,180 @@
+import heapq
+import json
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agent.prompt_utils import fit_to_budget
+
+KPI_SPECS_PATH = 'data/kpis.json'
+KPI_REFERENCE_PATH = 'data/kpi_reference.json'
+BUSINESS_DOC_PATH = 'buisness_doc.md'
+
+# Snippets added to a task, and the size of each
+RETRIEVAL_TOP_K = 3
+SNIPPET_TOKENS = 90
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from", "how", "i", "in", "is",
+    "it", "of", "on", "or", "our", "the", "to", "we", "what", "which", "with", "you", "your"
+}
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        if token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def kpi_documents(kpi_specs: Dict, kpi_reference: Dict) -> List[Tuple[str, str, str]]:
+    """One document per KPI combining its definition and its benchmark"""
+    documents = []
+    for name in list(kpi_specs) + [name for name in kpi_reference if name not in kpi_specs]:
+        spec = kpi_specs.get(name, {})
+        reference = kpi_reference.get(name)
+        parts = []
+        if spec.get('calculation_logic'):
+            parts.append(f"Calculation: {spec['calculation_logic']}.")
+        if spec.get('unit_of_measurement'):
+            parts.append(f"Unit: {spec['unit_of_measurement']}.")
+        if spec.get('required_data'):
+            parts.append("Inputs: " + "; ".join(item['description'] for item in spec['required_data']) + ".")
+        if spec and not spec.get('is_numerical', True):
+            parts.append("Narrative KPI scored against reference responses.")
+        if reference:
+            parts.append(f"Benchmark: best {reference.get('best_score')}, worst {reference.get('worst_score')} "
+                        f"{reference.get('unit', '')}".rstrip() + ".")
+        documents.append(('kpi', name, " ".join(parts)))
+    return documents
+
+
+def markdown_sections(text: str, source: str) -> List[Tuple[str, str, str]]:
+    """Split a Markdown document at its headings; titles carry the heading path"""
+    documents, path, lines = [], [], []
+
+    def flush():
+        body = " ".join(line.strip() for line in lines if line.strip())
+        if body:
+            documents.append((source, " > ".join(path) or source, body))
+        lines.clear()
+
+    for line in text.splitlines():
+        heading = _HEADING_PATTERN.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            path[level - 1:] = [heading.group(2).strip("# ")]
+        else:
+            lines.append(line)
+    flush()
+    return documents
+
+
+class KnowledgeIndex:
+    """
+    In-memory BM25 index over KPI definitions, benchmarks and product docs.
+
+    Postings are built once, so a query only touches the documents that
+    share a term with it; searching the bundled corpus takes well under a
+    millisecond.
+
+    Args:
+        documents (List[Tuple[str, str, str]]): (source, title, text) triples;
+            the title is indexed along with the text
+    """
+
+    def __init__(self, documents: List[Tuple[str, str, str]]):
+        self.documents = documents
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, (_, title, text) in enumerate(documents):
+            counts = Counter(_tokens(f"{title} {text}"))
+            lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                self._postings.setdefault(token, []).append((doc_id, count))
+        average_length = sum(lengths) / len(lengths) if lengths else 1.0
+        self._length_norm = [BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) for length in lengths]
+        total = len(documents)
+        self._idf = {
+            token: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_files(cls,
+                specs_path: str = KPI_SPECS_PATH,
+                reference_path: str = KPI_REFERENCE_PATH,
+                doc_path: str = BUSINESS_DOC_PATH) -> "KnowledgeIndex":
+        with open(specs_path, 'r', encoding='utf-8') as f:
+            kpi_specs = json.load(f)
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            kpi_reference = json.load(f)
+        with open(doc_path, 'r', encoding='utf-8') as f:
+            business_doc = f.read()
+        return cls(kpi_documents(kpi_specs, kpi_reference) + markdown_sections(business_doc, 'platform'))
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K, sources: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Documents ranked by BM25 score.
+
+        Args:
+            query (str): Free text, e.g. a question or KPI names
+            k (int): Maximum number of results
+            sources (Iterable[str]): Restrict results to these sources
+                ('kpi', 'platform')
+
+        Returns:
+            List[Dict]: source, title, text and score per match, best first
+        """
+        allowed = set(sources) if sources else None
+        scores: Dict[int, float] = {}
+        for token in set(_tokens(query)):
+            idf = self._idf.get(token)
+            if idf is None:
+                continue
+            for doc_id, count in self._postings[token]:
+                if allowed is None or self.documents[doc_id][0] in allowed:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (BM25_K1 + 1) / (
+                        count + self._length_norm[doc_id])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            {'source': self.documents[doc_id][0], 'title': self.documents[doc_id][1],
+            'text': self.documents[doc_id][2], 'score': round(score, 3)}
+            for doc_id, score in best
+        ]
+
+    def context(self,
+                query: str,
+                k: int = RETRIEVAL_TOP_K,
+                sources: Optional[Iterable[str]] = None,
+                snippet_tokens: int = SNIPPET_TOKENS) -> str:
+        """Top-k snippets formatted for a prompt, or an empty string"""
+        return "\n".join(
+            f"- [{match['title']}] {fit_to_budget(match['text'], snippet_tokens)}"
+            for match in self.search(query, k, sources)
+        )
+
+
+_knowledge_index = None
+_knowledge_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Return the process-wide knowledge index, built on first use"""
+    global _knowledge_index
+    with _knowledge_index_lock:
+        if _knowledge_index is None:
+            _knowledge_index = KnowledgeIndex.from_files()
+        return _knowledge_index
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+LLM_CACHE_PATH = os.path.join("session_files", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 2000
+# Set ESG_LLM_CACHE=off to bypass the cache for every call
+LLM_CACHE_ENABLED = os.getenv("ESG_LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of agent responses shared by all sessions and processes.
+
+    Entries are keyed by agent role, model and a hash of the rendered task,
+    expire after ttl_seconds, and the least recently used entries are evicted
+    once more than max_entries are stored.
+    """
+
+    def __init__(self,
+                path: str = LLM_CACHE_PATH,
+                ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    role TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(role: str, model: str, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{role}\0{model}\0{prompt_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a fresh cached response, or None"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache lookup failed: {str(e)}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, role: str, model: str, response: str):
+        """Store a response and evict expired and least recently used entries"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, role, model, response, now, now)
+                )
+                conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                conn.execute("""
+                    DELETE FROM llm_cache WHERE key NOT IN (
+                        SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT ?
+                    )
+                """, (self.max_entries,))
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache write failed: {str(e)}")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+        return _llm_cache
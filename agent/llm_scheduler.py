@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+# Lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+
+MAX_CONCURRENCY = int(os.getenv("ESG_LLM_MAX_CONCURRENCY", "4"))
+# Requests per minute across the process; 0 disables the rate limit
+RATE_PER_MINUTE = float(os.getenv("ESG_LLM_RATE_PER_MINUTE", "60"))
+MAX_RETRIES = 2
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 30.0
+
+T = TypeVar("T")
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed model call may succeed when repeated.
+
+    Rate limits (429), server errors (5xx) and timeouts are transient;
+    authentication and request validation errors fail the same way again.
+    """
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("RateLimitError", "ServiceUnavailableError", "InternalServerError")
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of every model call.
+
+    A call needs a concurrency slot and a token from a token bucket refilled
+    at rate_per_minute. Waiting calls are served by priority (interactive
+    before batch) and then in arrival order. Transient failures are retried
+    with full-jitter exponential backoff, releasing their slot while they
+    sleep.
+    """
+
+    def __init__(self,
+                max_concurrency: int = MAX_CONCURRENCY,
+                rate_per_minute: float = RATE_PER_MINUTE,
+                burst: Optional[int] = None,
+                max_retries: int = MAX_RETRIES,
+                backoff_base: float = BACKOFF_BASE_SECONDS,
+                backoff_cap: float = BACKOFF_CAP_SECONDS):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_second = max(0.0, rate_per_minute) / 60
+        self.capacity = float(burst or self.max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate_per_second:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+        else:
+            self._tokens = self.capacity
+        self._last_refill = now
+
+    def acquire(self, priority: int = INTERACTIVE) -> float:
+        """
+        Block until the call may start.
+
+        Returns:
+            float: Seconds spent waiting in the queue
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                self._refill()
+                at_head = self._waiting[0] == entry
+                if at_head and self._in_flight < self.max_concurrency and self._tokens >= 1:
+                    heapq.heappop(self._waiting)
+                    self._in_flight += 1
+                    self._tokens -= 1
+                    # Let the next waiter re-check now that the head has moved
+                    self._cond.notify_all()
+                    return time.monotonic() - start
+                timeout = None
+                if at_head and self._in_flight < self.max_concurrency:
+                    timeout = (1 - self._tokens) / self.rate_per_second
+                self._cond.wait(timeout)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE) -> Iterator[float]:
+        """Hold a slot for the duration of the block; yields the queue wait"""
+        queue_seconds = self.acquire(priority)
+        try:
+            yield queue_seconds
+        finally:
+            self.release()
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, attempt: int, error: Exception) -> bool:
+        """Whether a call that failed on this attempt gets another one"""
+        return attempt < self.max_retries and is_retryable(error)
+
+    def wait_to_retry(self, label: str, attempt: int, error: Exception):
+        """Log a failed attempt and sleep out its backoff; no slot is held meanwhile"""
+        logging.warning(f"{label} call failed (attempt {attempt + 1}): {str(error)}")
+        time.sleep(self.backoff_seconds(attempt))
+
+    def call(self, fn: Callable[[], T], priority: int = INTERACTIVE, label: str = "LLM") -> Tuple[T, int, float]:
+        """
+        Run fn under the scheduler, retrying transient failures.
+
+        Args:
+            fn (Callable): The model call
+            priority (int): INTERACTIVE or BATCH
+            label (str): Name used in retry log messages
+
+        Returns:
+            tuple: (result, number of retries, total queue wait in seconds)
+
+        Raises:
+            Exception: The last error of fn, with the retries made before it
+                as llm_retries
+        """
+        queue_seconds = 0.0
+        for attempt in range(self.max_retries + 1):
+            queue_seconds += self.acquire(priority)
+            try:
+                return fn(), attempt, queue_seconds
+            except Exception as e:
+                if not self.should_retry(attempt, e):
+                    e.llm_retries = attempt
+                    raise
+                error = e
+            finally:
+                self.release()
+            self.wait_to_retry(label, attempt, error)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            self._refill()
+            return {
+                "in_flight": self._in_flight,
+                "queued": len(self._waiting),
+                "tokens": round(self._tokens, 2)
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
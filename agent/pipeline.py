@@ -0,0 +1,288 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+CHECKPOINT_DIR = os.path.join("session_files", "checkpoints")
+# Older kpi_data versions beyond this many are dropped per session
+MAX_CHECKPOINTS_PER_SESSION = 5
+# Session directories untouched for this long are deleted, and at most
+# MAX_CHECKPOINT_SESSIONS of the most recent ones are kept
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("ESG_CHECKPOINT_MAX_AGE_HOURS", "24"))
+MAX_CHECKPOINT_SESSIONS = int(os.getenv("ESG_CHECKPOINT_MAX_SESSIONS", "200"))
+# Session directories are scanned at most this often per process and root
+SESSION_CLEANUP_INTERVAL_SECONDS = 600
+# Bumped when stage output formats change, so older checkpoints are not reused
+CHECKPOINT_FORMAT = 2
+
+
+def hash_kpi_data(data: Dict, industry: str) -> str:
+    """Stable hash of the KPI values and industry a run was computed from"""
+    payload = json.dumps({"format": CHECKPOINT_FORMAT, "industry": industry, "data": data},
+                        sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# One lock per checkpoint file, shared by every StageCheckpoint of the process
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+_last_cleanup: Dict[str, float] = {}
+_cleanup_lock = threading.Lock()
+
+
+def prune_checkpoint_sessions(root: str = CHECKPOINT_DIR, keep: Iterable[str] = ()) -> int:
+    """
+    Delete checkpoint directories of sessions that have ended.
+
+    A session directory counts as ended once it has not been written for
+    CHECKPOINT_MAX_AGE_HOURS, or when it falls outside the
+    MAX_CHECKPOINT_SESSIONS most recently written ones.
+
+    Args:
+        root (str): Checkpoint root holding one directory per session
+        keep (Iterable[str]): Session ids never deleted, e.g. the caller's own
+
+    Returns:
+        int: Number of session directories deleted
+    """
+    keep = set(keep)
+    sessions = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name not in keep:
+                    try:
+                        sessions.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+    except OSError:
+        return 0
+    sessions.sort(reverse=True)
+    cutoff = time.time() - CHECKPOINT_MAX_AGE_HOURS * 3600
+    # The kept sessions take their places among the most recent ones
+    limit = max(0, MAX_CHECKPOINT_SESSIONS - len(keep))
+    stale = [path for position, (mtime, path) in enumerate(sessions) if mtime < cutoff or position >= limit]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    if stale:
+        logging.info(f"Deleted {len(stale)} checkpoint session(s) from {root}")
+    return len(stale)
+
+
+def _maybe_prune_sessions(root: str, session_id: str):
+    now = time.time()
+    with _cleanup_lock:
+        if now - _last_cleanup.get(root, 0.0) < SESSION_CLEANUP_INTERVAL_SECONDS:
+            return
+        _last_cleanup[root] = now
+    prune_checkpoint_sessions(root, keep=(session_id,))
+
+
+class PipelineCancelled(Exception):
+    """Raised by StagePipeline.run when its cancel event was set"""
+
+
+class PipelineStage:
+    """
+    One node of the advisor pipeline.
+
+    Args:
+        name (str): Stage key, used for checkpoints and dependencies
+        run (Callable): Called with {dependency name: output} and returns the
+            stage output: a string or a JSON-serializable parsed structure
+        depends_on (Iterable[str]): Names of stages whose outputs run needs
+        label (str): Display name for progress and results
+        render (Callable): Optional formatter turning the output into Markdown
+            for display
+    """
+
+    def __init__(self,
+                name: str,
+                run: Callable[[Dict[str, Any]], Any],
+                depends_on: Iterable[str] = (),
+                label: Optional[str] = None,
+                render: Optional[Callable[[Any], str]] = None):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.label = label or name.title()
+        self.render = render
+
+
+class StageCheckpoint:
+    """
+    Stage outputs of one (session, kpi_data hash) pair, persisted as JSON.
+
+    Each completed stage is written immediately, so a failed run keeps every
+    stage that finished before the failure. Several instances may share a
+    file, e.g. a background warm-up and a chat run of the same session and
+    data; a write merges with the stages already on disk under a per-file
+    lock, so neither drops the other's outputs. Creating a checkpoint also
+    deletes the directories of sessions that have ended, at most every
+    SESSION_CLEANUP_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, session_id: str, data_hash: str, root: str = CHECKPOINT_DIR):
+        _maybe_prune_sessions(root, session_id)
+        self.session_dir = os.path.join(root, session_id)
+        self.path = os.path.join(self.session_dir, f"{data_hash}.json")
+        self._lock = threading.Lock()
+        with _file_locks_guard:
+            self._file_lock = _file_locks.setdefault(os.path.abspath(self.path), threading.Lock())
+        self.outputs: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.path}: {str(e)}")
+            return {}
+
+    def get(self, stage: str) -> Optional[Any]:
+        with self._lock:
+            return self.outputs.get(stage)
+
+    def put(self, stage: str, output: Any):
+        with self._lock:
+            self.outputs[stage] = output
+        with self._file_lock:
+            # Stages saved by another instance since this one was loaded are kept
+            merged = self._load()
+            with self._lock:
+                merged.update(self.outputs)
+                self.outputs = dict(merged)
+            try:
+                os.makedirs(self.session_dir, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(merged, f)
+                os.replace(tmp_path, self.path)
+                self._prune()
+            except OSError as e:
+                logging.warning(f"Checkpoint write failed: {str(e)}")
+
+    def _prune(self):
+        """Keep only the most recent checkpoints of this session"""
+        files = [os.path.join(self.session_dir, name)
+                for name in os.listdir(self.session_dir) if name.endswith(".json")]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for stale in files[MAX_CHECKPOINTS_PER_SESSION:]:
+            os.remove(stale)
+
+
+class StagePipeline:
+    """
+    DAG of pipeline stages run with checkpoint reuse.
+
+    Stages whose dependencies are satisfied run concurrently on worker
+    threads. Callbacks are invoked on the calling thread, so they may update
+    Streamlit elements.
+    """
+
+    def __init__(self, stages: List[PipelineStage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.depends_on if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def run(self,
+            checkpoint: StageCheckpoint,
+            reuse: bool = True,
+            max_workers: int = 3,
+            on_stage_start: Optional[Callable[[PipelineStage], None]] = None,
+            on_stage_complete: Optional[Callable[[PipelineStage, Any, bool], None]] = None,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Run every stage not already checkpointed.
+
+        Args:
+            checkpoint (StageCheckpoint): Where stage outputs are read and written
+            reuse (bool): Set to False to recompute checkpointed stages
+            max_workers (int): Maximum stages running at once
+            on_stage_start (Callable): Called with the stage when it is submitted
+            on_stage_complete (Callable): Called with (stage, output, from_checkpoint)
+            cancel (threading.Event): When set, no further stages are started;
+                stages already running finish and are checkpointed
+
+        Returns:
+            Dict[str, Any]: Output per stage name
+
+        Raises:
+            Exception: The first stage failure, after in-flight stages have
+                finished and been checkpointed
+            PipelineCancelled: When cancel was set before all stages ran
+        """
+        outputs: Dict[str, Any] = {}
+        for name in self.order:
+            cached = checkpoint.get(name) if reuse else None
+            if cached is not None:
+                outputs[name] = cached
+                if on_stage_complete:
+                    on_stage_complete(self.stages[name], cached, True)
+
+        running: Dict[Future, PipelineStage] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="esg-stage") as executor:
+            while True:
+                if error is None and not (cancel and cancel.is_set()):
+                    in_flight = {stage.name for stage in running.values()}
+                    for name in self.order:
+                        stage = self.stages[name]
+                        if (name not in outputs and name not in in_flight
+                                and all(dep in outputs for dep in stage.depends_on)):
+                            if on_stage_start:
+                                on_stage_start(stage)
+                            inputs = {dep: outputs[dep] for dep in stage.depends_on}
+                            running[executor.submit(stage.run, inputs)] = stage
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        output = future.result()
+                    except Exception as e:
+                        logging.error(f"Stage {stage.name} failed: {str(e)}")
+                        error = error or e
+                        continue
+                    outputs[stage.name] = output
+                    checkpoint.put(stage.name, output)
+                    if on_stage_complete:
+                        on_stage_complete(stage, output, False)
+
+        if error is not None:
+            raise error
+        if len(outputs) < len(self.stages):
+            raise PipelineCancelled(f"Cancelled with {len(self.stages) - len(outputs)} stage(s) not run")
+        return outputs
@@ -1,33 +1,187 @@
 import streamlit as st
-from typing import Optional, List, Dict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import logging
+import threading
 import time
 
-class ProgressTracker:
-    """Handle progress tracking and UI updates"""
-    
+class RunTimings:
+    """
+    Wall-clock timings for one analysis run.
+
+    Stages may run concurrently and LLM calls are recorded from worker
+    threads, so all writes go through a lock. Each stage keeps its start and
+    end, so concurrent stages are not counted twice when the overhead is
+    derived from the total.
+    """
+
     def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.intervals: List[Tuple[str, float, float]] = []
+        self.llm_calls: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + end - start
+                self.intervals.append((name, start, end))
+
+    def record_llm_call(self, role: str, model: str, seconds: float, queue_seconds: float = 0.0):
+        """Record one agent call: model time and time queued for the LLM scheduler"""
+        with self._lock:
+            self.llm_calls.append({
+                "role": role, "model": model, "seconds": seconds, "queue_seconds": queue_seconds
+            })
+
+    def finish(self):
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    @staticmethod
+    def _busy_time(intervals: List[Tuple[str, float, float]]) -> Tuple[float, Set[str]]:
+        """Length of the union of the stage intervals, and the stages that overlap another"""
+        busy = 0.0
+        overlapping: Set[str] = set()
+        current_end = None
+        current_names: List[str] = []
+        for name, start, end in sorted(intervals, key=lambda interval: interval[1]):
+            if current_end is not None and start < current_end:
+                overlapping.update(current_names)
+                overlapping.add(name)
+                current_names.append(name)
+                if end > current_end:
+                    busy += end - current_end
+                    current_end = end
+            else:
+                busy += end - start
+                current_end = end
+                current_names = [name]
+        return busy, overlapping
+
+    def breakdown(self) -> Dict:
+        """
+        Summarize the run.
+
+        Returns:
+            Dict: total, per-stage and per-call seconds; busy is the time at
+                least one stage was running, overhead the rest of the total,
+                and concurrent lists the stages that overlapped another
+        """
+        end = self.finished_at or time.perf_counter()
+        total = end - self.started_at
+        with self._lock:
+            stages = dict(self.stages)
+            intervals = list(self.intervals)
+            llm_calls = list(self.llm_calls)
+        busy, overlapping = self._busy_time(intervals)
+        return {
+            "total_seconds": total,
+            "stages": stages,
+            "concurrent": [name for name in stages if name in overlapping],
+            "llm_calls": llm_calls,
+            "llm_seconds": sum(call["seconds"] for call in llm_calls),
+            "queue_seconds": sum(call["queue_seconds"] for call in llm_calls),
+            "busy_seconds": busy,
+            "overhead_seconds": max(0.0, total - busy)
+        }
+
+    def to_markdown(self) -> str:
+        """Render the breakdown as a Markdown table"""
+        summary = self.breakdown()
+        concurrent = set(summary["concurrent"])
+        lines = ["| Step | Seconds |", "|---|---:|"]
+        lines += [f"| {name}{' ⇉' if name in concurrent else ''} | {seconds:.2f} |"
+                for name, seconds in summary["stages"].items()]
+        lines += [f"| ↳ {call['role']} ({call['model']}) | {call['seconds']:.2f} |"
+                + (f" + {call['queue_seconds']:.2f} queued" if call['queue_seconds'] >= 0.01 else "")
+                for call in summary["llm_calls"]]
+        lines.append(f"| Pipeline overhead | {summary['overhead_seconds']:.2f} |")
+        lines.append(f"| **Total** | **{summary['total_seconds']:.2f}** |")
+        if concurrent:
+            lines.append("\n⇉ ran concurrently with other stages, so stage rows add up to more than "
+                        f"the {summary['busy_seconds']:.2f}s the stages took together.")
+        return "\n".join(lines)
+
+def in_script_thread() -> bool:
+    """Whether the caller runs inside a Streamlit script, where UI elements can be created"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+
+class ProgressTracker:
+    """
+    Handle progress tracking and UI updates
+
+    Args:
+        show_ui (bool): Create Streamlit progress elements; set to False for
+            runs outside a Streamlit script, such as batch workers and CLIs,
+            where only the timings are kept
+    """
+
+    def __init__(self, show_ui: bool = True):
+        self.show_ui = show_ui
         self.status_placeholder: Optional[st.empty] = None
         self.progress_bar: Optional[st.progress] = None
         self.thought_placeholder: Optional[st.empty] = None
-        
-    def init_tracking(self):
-        """Initialize tracking UI elements"""
-        self.status_placeholder = st.empty()
-        self.progress_bar = st.progress(0)
-        self.thought_placeholder = st.empty()
-        
-    def update_status(self, stage: str, status: str, progress: float):
-        """Update status display"""
+        self.timings = RunTimings()
+        self.total_steps = 1
+        self.completed_steps = 0
+
+    def init_tracking(self, total_steps: int = 1):
+        """
+        Initialize tracking UI elements and timings for a new run
+
+        Args:
+            total_steps (int): Number of units of work in the run; the bar
+                advances by one unit each time complete_step is called
+        """
+        if self.show_ui:
+            self.status_placeholder = st.empty()
+            self.progress_bar = st.progress(0)
+            self.thought_placeholder = st.empty()
+        self.timings = RunTimings()
+        self.total_steps = max(1, total_steps)
+        self.completed_steps = 0
+
+    @property
+    def fraction_complete(self) -> float:
+        return min(1.0, self.completed_steps / self.total_steps)
+
+    def update_status(self, stage: str, status: str, progress: Optional[float] = None):
+        """Update status display; progress defaults to the completed fraction of the run"""
+        if progress is None:
+            progress = self.fraction_complete
         if self.status_placeholder:
             self.status_placeholder.info(f"{stage}: {status}")
         if self.progress_bar:
             self.progress_bar.progress(progress)
-            
+
+    def complete_step(self, stage: str, status: str = "Complete"):
+        """Mark one unit of work as done and advance the bar"""
+        self.completed_steps += 1
+        self.update_status(stage, status)
+
     def show_thought(self, thought: str):
         """Display current thought process"""
         if self.thought_placeholder:
             self.thought_placeholder.markdown(f"💭 {thought}")
-            
+
+    def error(self, message: str):
+        """Show an error in the app, or log it when there is no UI"""
+        if self.show_ui:
+            st.error(message)
+        else:
+            logging.error(message)
+
     def clear(self):
         """Clear all progress elements"""
         if self.status_placeholder:
@@ -38,23 +192,18 @@ class ProgressTracker:
             self.thought_placeholder.empty()
 
 class AnalysisStage:
-    """Track progress for a specific analysis stage"""
-    
+    """Run one pipeline stage, timing it and advancing progress when it completes"""
+
     def __init__(self, name: str, steps: List[str], tracker: ProgressTracker):
         self.name = name
         self.steps = steps
         self.tracker = tracker
-        self.total_steps = len(steps)
-        
-    def execute(self, callback):
+
+    def execute(self, callback: Callable[[], object]):
         """Execute stage with progress tracking"""
-        for i, step in enumerate(self.steps):
-            self.tracker.update_status(
-                self.name,
-                step,
-                (i + 1) / self.total_steps
-            )
-            self.tracker.show_thought(f"Currently: {step}")
-            result = callback(step)
-            time.sleep(0.5)
-            return result
\ No newline at end of file
+        self.tracker.update_status(self.name, "Running")
+        self.tracker.show_thought(f"Currently: {', '.join(self.steps).lower()}")
+        with self.tracker.timings.stage(self.name):
+            result = callback()
+        self.tracker.complete_step(self.name)
+        return result
@@ -0,0 +1,55 @@
+import json
+import logging
+import math
+from typing import Any
+
+# Rough average for English text with Gemini/GPT style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token-count estimate used for logging and prompt budgeting"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(data: Any) -> str:
+    """
+    Serialize data for a prompt without indentation or extra whitespace.
+
+    Strings (e.g. earlier agent outputs) are passed through unchanged so they
+    are not escaped onto a single line.
+    """
+    if isinstance(data, str):
+        return data
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def render_prompt(description: str, label: str) -> str:
+    """
+    Strip template indentation from a task description and log its size.
+
+    Only the template's own indent (taken from its first line) is removed, so
+    multi-line values interpolated into the template keep their layout.
+    """
+    lines = description.strip("\n").splitlines()
+    first_line = next((line for line in lines if line.strip()), "")
+    indent = first_line[:len(first_line) - len(first_line.lstrip())]
+    dedented = []
+    for line in lines:
+        if not line.strip():
+            dedented.append("")
+        elif line.startswith(indent):
+            dedented.append(line[len(indent):])
+        else:
+            dedented.append(line)
+    prompt = "\n".join(dedented).strip()
+    logging.info(f"Prompt for {label}: ~{estimate_tokens(prompt)} tokens ({len(prompt)} chars)")
+    return prompt
+
+
+def fit_to_budget(text: str, max_tokens: int) -> str:
+    """Truncate text to roughly max_tokens, marking the cut"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 15)].rstrip() + " …[truncated]"
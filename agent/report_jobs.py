@@ -0,0 +1,367 @@
+"""
+Persistent queue of batch advisory report jobs.
+
+Jobs are stored in SQLite, so they survive restarts: a job left running by a
+process that died is put back in the queue, and because each job runs under
+its own checkpoint session the retry resumes after the last finished stage.
+A failed attempt is retried after an exponentially growing delay.
+Finished reports are written to the artifact store as Markdown and HTML.
+
+    python -m agent.report_jobs submit companies.json
+    python -m agent.report_jobs run --workers 2
+
+companies.json is a list of {"company": ..., "industry": ..., "data": {KPI: value}}.
+"""
+import argparse
+import html
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+REPORT_JOBS_PATH = os.path.join("session_files", "report_jobs.sqlite3")
+REPORT_ARTIFACT_DIR = os.path.join("session_files", "reports")
+DEFAULT_WORKERS = int(os.getenv("ESG_REPORT_WORKERS", "2"))
+# Attempts per job before it is marked failed
+MAX_ATTEMPTS = 3
+# Delay before retrying a failed attempt, doubled for each further attempt
+RETRY_BASE_SECONDS = 30.0
+RETRY_CAP_SECONDS = 15 * 60.0
+# Idle workers poll the queue this often, in seconds
+POLL_SECONDS = 2.0
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next attempt of a job that failed attempts times"""
+    return min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ReportArtifactStore:
+    """Finished reports on disk, one Markdown and one HTML file per job"""
+
+    def __init__(self, root: str = REPORT_ARTIFACT_DIR):
+        self.root = root
+
+    def path(self, job_id: str, fmt: str = "md") -> str:
+        return os.path.join(self.root, f"{job_id}.{fmt}")
+
+    def save(self, job_id: str, title: str, markdown_text: str) -> str:
+        """Write both formats atomically and return the Markdown path"""
+        os.makedirs(self.root, exist_ok=True)
+        for fmt, content in (("md", markdown_text), ("html", self.to_html(title, markdown_text))):
+            path = self.path(job_id, fmt)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+        return self.path(job_id)
+
+    def read(self, job_id: str, fmt: str = "md") -> Optional[str]:
+        try:
+            with open(self.path(job_id, fmt), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def to_html(title: str, markdown_text: str) -> str:
+        """Standalone HTML page; uses the markdown package when it is installed"""
+        try:
+            import markdown
+            body = markdown.markdown(markdown_text, extensions=["tables"])
+        except ImportError:
+            body = f"<pre>{html.escape(markdown_text)}</pre>"
+        return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                f"<title>{html.escape(title)}</title></head>\n<body>\n{body}\n</body></html>\n")
+
+
+class ReportJobQueue:
+    """
+    SQLite-backed queue of full advisory report runs.
+
+    Any number of processes may submit jobs; claiming is atomic, so workers
+    in several processes never run the same job. Each process runs at most
+    max_workers jobs at once, and every LLM call is made at BATCH priority
+    so chat sessions are served first.
+    """
+
+    def __init__(self,
+                path: str = REPORT_JOBS_PATH,
+                artifacts: Optional[ReportArtifactStore] = None,
+                max_workers: int = DEFAULT_WORKERS):
+        self.path = path
+        self.artifacts = artifacts or ReportArtifactStore()
+        self.max_workers = max_workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS report_jobs (
+                    id TEXT PRIMARY KEY,
+                    company TEXT NOT NULL,
+                    industry TEXT NOT NULL,
+                    kpi_data TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    error TEXT,
+                    artifact TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    not_before REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(report_jobs)")}
+            if "not_before" not in columns:
+                conn.execute("ALTER TABLE report_jobs ADD COLUMN not_before REAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, company: str, industry: str, kpi_data: Dict) -> str:
+        """Queue a report for one company and return the job id"""
+        job_id = uuid.uuid4().hex[:12]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO report_jobs (id, company, industry, kpi_data, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, company, industry, json.dumps(kpi_data, default=str), QUEUED, time.time())
+            )
+        return job_id
+
+    def jobs(self, limit: int = 200) -> List[Dict]:
+        """Most recent jobs first, without their KPI data"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, company, industry, status, attempts, error, artifact, "
+                "created_at, started_at, finished_at, not_before FROM report_jobs "
+                "ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM report_jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def retry(self, job_id: str):
+        """Put a failed job back in the queue with a fresh attempt budget"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, attempts = 0, error = NULL, not_before = NULL "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, job_id, FAILED)
+            )
+
+    def recover(self) -> int:
+        """
+        Requeue jobs left running by workers that no longer exist.
+
+        Only workers on this host can be checked, so jobs claimed on other
+        hosts are left alone.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        host = socket.gethostname()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker FROM report_jobs WHERE status = ?", (RUNNING,)).fetchall()
+            stale = []
+            for row in rows:
+                worker_host, _, pid = (row["worker"] or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                    stale.append(row["id"])
+            for job_id in stale:
+                conn.execute("UPDATE report_jobs SET status = ?, worker = NULL WHERE id = ?", (QUEUED, job_id))
+        if stale:
+            logging.info(f"Requeued {len(stale)} report job(s) interrupted by a crash")
+        return len(stale)
+
+    def _claim(self) -> Optional[Dict]:
+        """Atomically take the oldest queued job whose retry delay has passed"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM report_jobs WHERE status = ? AND (not_before IS NULL OR not_before <= ?) "
+                "ORDER BY created_at LIMIT 1", (QUEUED, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ? "
+                "WHERE id = ?",
+                (RUNNING, self.worker_id, time.time(), row["id"])
+            )
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _next_retry_seconds(self) -> Optional[float]:
+        """Seconds until the earliest queued job may be claimed, or None if nothing is queued"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), MIN(COALESCE(not_before, 0)) FROM report_jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+        if not row[0]:
+            return None
+        return max(0.0, row[1] - time.time())
+
+    def _finish(self,
+                job_id: str,
+                status: str,
+                error: Optional[str] = None,
+                artifact: Optional[str] = None,
+                not_before: Optional[float] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE report_jobs SET status = ?, error = ?, artifact = ?, worker = NULL, finished_at = ?, "
+                "not_before = ? WHERE id = ?",
+                (status, error, artifact, time.time(), not_before, job_id)
+            )
+
+    def run_job(self, job: Dict):
+        """Run one claimed job and record its outcome"""
+        from agent.agentic_chatbot import ESGAdvisorSystem
+        from agent.llm_scheduler import BATCH
+        from agent.progress import ProgressTracker
+
+        # One checkpoint session per job, so a rerun reuses finished stages
+        advisor = ESGAdvisorSystem(session_id=f"report-{job['id']}")
+        advisor.priority = BATCH
+        # Workers have no Streamlit script to draw progress in
+        advisor.progress = ProgressTracker(show_ui=False)
+        try:
+            report = advisor.run_report({"type": "full_analysis", "data": json.loads(job["kpi_data"])},
+                                        job["industry"])
+            title = f"ESG advisory report: {job['company']} ({job['industry']})"
+            artifact = self.artifacts.save(job["id"], title, f"# {title}\n\n{report}")
+        except Exception as e:
+            logging.error(f"Report job {job['id']} failed (attempt {job['attempts']}): {str(e)}")
+            if job["attempts"] >= MAX_ATTEMPTS:
+                self._finish(job["id"], FAILED, error=str(e))
+            else:
+                self._finish(job["id"], QUEUED, error=str(e),
+                            not_before=time.time() + retry_delay(job["attempts"]))
+            return
+        self._finish(job["id"], DONE, artifact=artifact)
+
+    def _worker(self, drain: bool):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                wait = self._next_retry_seconds() if drain else POLL_SECONDS
+                if wait is None:
+                    return
+                # Draining workers stay until jobs waiting out a retry delay are done
+                self._stop.wait(min(POLL_SECONDS, wait) if drain else wait)
+                continue
+            self.run_job(job)
+
+    def start(self, drain: bool = False):
+        """
+        Start the worker threads if they are not already running.
+
+        Args:
+            drain (bool): Let workers exit once the queue is empty instead of
+                polling for new jobs
+        """
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            self.recover()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, args=(drain,), name=f"report-job-{i}", daemon=True)
+                for i in range(self.max_workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stop(self):
+        """Stop claiming new jobs; jobs already running finish first"""
+        self._stop.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+_report_queue = None
+_report_queue_lock = threading.Lock()
+
+
+def get_report_queue() -> ReportJobQueue:
+    """Return the process-wide report job queue"""
+    global _report_queue
+    with _report_queue_lock:
+        if _report_queue is None:
+            _report_queue = ReportJobQueue()
+        return _report_queue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue and run batch ESG advisory reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    submit_parser = commands.add_parser("submit", help="Queue one report per company in a JSON file")
+    submit_parser.add_argument("companies", help="JSON list of {company, industry, data}")
+    run_parser = commands.add_parser("run", help="Run queued jobs until the queue is empty")
+    run_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs run at once")
+    commands.add_parser("status", help="Show job counts")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "submit":
+        with open(args.companies, "r", encoding="utf-8") as f:
+            companies = json.load(f)
+        queue = get_report_queue()
+        for company in companies:
+            job_id = queue.submit(company["company"], company["industry"], company["data"])
+            print(f"{job_id}  {company['company']}")
+    elif args.command == "run":
+        queue = ReportJobQueue(max_workers=args.workers)
+        queue.start(drain=True)
+        queue.join()
+        print(queue.counts())
+    else:
+        print(get_report_queue().counts())
@@ -0,0 +1,136 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, Optional
+
+from agent.prompt_utils import fit_to_budget
+
+# Bounds applied to every parsed field, so stage outputs passed on to later
+# prompts stay the same size however verbose the model was
+MAX_TEXT_TOKENS = 160
+MAX_LIST_ITEMS = 5
+MAX_ITEM_TOKENS = 40
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+_TYPE_NAMES = {str: "string", list: "list of strings", float: "number"}
+
+
+def _extract_json(text: str) -> Optional[Dict]:
+    """First JSON object in a model response, ignoring code fences and surrounding prose"""
+    text = _FENCE_PATTERN.sub("", text.strip())
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            start = text.find("{", start + 1)
+            continue
+        if isinstance(value, dict):
+            return value
+        start = text.find("{", start + 1)
+    return None
+
+
+def _coerce(value: Any, kind: type) -> Any:
+    if kind is float:
+        try:
+            return round(float(value), 2)
+        except (TypeError, ValueError):
+            return None
+    if kind is list:
+        if value is None:
+            return []
+        items = value if isinstance(value, list) else [value]
+        return [fit_to_budget(item if isinstance(item, str) else json.dumps(item, default=str), MAX_ITEM_TOKENS)
+                for item in items[:MAX_LIST_ITEMS] if item not in (None, "")]
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = "; ".join(str(item) for item in value)
+    elif not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return fit_to_budget(value, MAX_TEXT_TOKENS)
+
+
+class StageSchema:
+    """
+    Declared output of an intermediate advisor stage.
+
+    The model's response is parsed and validated once, when the stage
+    completes; the resulting dict is what is checkpointed and what later
+    stages receive, instead of the raw response text.
+
+    Args:
+        name (str): Stage name, used in log messages
+        fields (Dict[str, type]): Field name to str, list (of strings) or float
+        text_field (str): Field that receives the raw response when it
+            contains no JSON object
+        aliases (Dict[str, str]): Alternative key names models use for a field
+    """
+
+    def __init__(self,
+                name: str,
+                fields: Dict[str, type],
+                text_field: str,
+                aliases: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.fields = fields
+        self.text_field = text_field
+        self.aliases = aliases or {}
+
+    def instructions(self) -> str:
+        """Prompt lines describing the expected JSON"""
+        keys = ", ".join(f"{field} ({_TYPE_NAMES[kind]})" for field, kind in self.fields.items())
+        return (f"Return only a JSON object with the keys {keys}. "
+                f"Keep list items to one short sentence and at most {MAX_LIST_ITEMS} per list.")
+
+    def parse(self, text: str) -> Dict:
+        """
+        Validate a response against the schema.
+
+        Unknown keys are dropped, missing ones get empty values and every
+        value is coerced to its declared type and size bounds. A response
+        without JSON is kept, truncated, in text_field.
+        """
+        raw = _extract_json(text) if isinstance(text, str) else text
+        if not isinstance(raw, dict):
+            logging.warning(f"{self.name} output is not JSON; keeping it as {self.text_field}")
+            raw = {self.text_field: text}
+        for alias, field in self.aliases.items():
+            if field not in raw and alias in raw:
+                raw[field] = raw[alias]
+        return {field: _coerce(raw.get(field), kind) for field, kind in self.fields.items()}
+
+    @staticmethod
+    def select(output: Dict, fields: Iterable[str]) -> Dict:
+        """The subset of a parsed output a later stage needs"""
+        return {field: output[field] for field in fields if output.get(field) not in (None, "", [])}
+
+    def to_markdown(self, output: Dict) -> str:
+        lines = []
+        for field, kind in self.fields.items():
+            value = output.get(field)
+            if value in (None, "", []):
+                continue
+            title = field.replace("_", " ").capitalize()
+            if kind is list:
+                lines.append(f"**{title}**\n" + "\n".join(f"- {item}" for item in value))
+            else:
+                lines.append(f"**{title}:** {value}")
+        return "\n\n".join(lines)
+
+
+DATA_SCHEMA = StageSchema(
+    "data",
+    {'completeness': float, 'issues': list, 'anomalies': list, 'summary': str},
+    text_field='summary',
+    aliases={'completeness_score': 'completeness', 'identified_issues': 'issues'}
+)
+
+CATEGORY_SCHEMA = StageSchema(
+    "category",
+    {'assessment': str, 'risks': list, 'opportunities': list},
+    text_field='assessment',
+    aliases={'performance_assessment': 'assessment', 'improvement_opportunities': 'opportunities'}
+)
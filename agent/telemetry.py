@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+TELEMETRY_LOG_PATH = os.path.join("session_files", "telemetry", "llm_calls.jsonl")
+# Records kept in memory for the admin panel; the JSONL log keeps everything
+MAX_IN_MEMORY_RECORDS = 10000
+
+
+class TelemetryRecorder:
+    """
+    Per-call LLM telemetry shared by all sessions.
+
+    Each agent call is kept in memory for aggregation and appended to a JSONL
+    log for capacity planning. Token counts come from the provider when it
+    reports usage and are estimated from text length otherwise.
+    """
+
+    def __init__(self, log_path: str = TELEMETRY_LOG_PATH, max_records: int = MAX_IN_MEMORY_RECORDS):
+        self.log_path = log_path
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self,
+            session_id: Optional[str],
+            role: str,
+            model: str,
+            prompt_tokens: int,
+            completion_tokens: int,
+            wall_seconds: float,
+            queue_seconds: float = 0.0,
+            retries: int = 0,
+            cached: bool = False,
+            streamed: bool = False,
+            estimated_tokens: bool = True,
+            error: Optional[str] = None) -> Dict:
+        """
+        Record one agent call
+
+        wall_seconds is model time only; time spent waiting for the LLM
+        scheduler is reported as queue_seconds.
+
+        Returns:
+            Dict: The stored record
+        """
+        entry = {
+            "timestamp": time.time(),
+            "session_id": session_id or "unknown",
+            "role": role,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "wall_seconds": round(wall_seconds, 4),
+            "queue_seconds": round(queue_seconds, 4),
+            "retries": retries,
+            "cached": cached,
+            "streamed": streamed,
+            "estimated_tokens": estimated_tokens,
+            "error": error
+        }
+        with self._lock:
+            self._records.append(entry)
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logging.warning(f"Telemetry log write failed: {str(e)}")
+        return entry
+
+    def records(self, session_id: Optional[str] = None) -> List[Dict]:
+        """In-memory records, optionally for one session"""
+        with self._lock:
+            records = list(self._records)
+        if session_id is not None:
+            records = [r for r in records if r["session_id"] == session_id]
+        return records
+
+    def aggregate(self, by: Iterable[str] = ("role",), session_id: Optional[str] = None) -> List[Dict]:
+        """
+        Aggregate calls by the given record fields.
+
+        Args:
+            by (Iterable[str]): Grouping fields, e.g. ("session_id", "role")
+            session_id (str): Only include this session's calls
+
+        Returns:
+            List[Dict]: One row per group with call counts, token totals and
+                wall-time statistics, slowest groups first
+        """
+        by = tuple(by)
+        groups: Dict[tuple, List[Dict]] = {}
+        for record in self.records(session_id):
+            groups.setdefault(tuple(record[field] for field in by), []).append(record)
+
+        rows = []
+        for key, records in groups.items():
+            wall = np.array([r["wall_seconds"] for r in records])
+            rows.append({
+                **dict(zip(by, key)),
+                "calls": len(records),
+                "cache_hits": sum(r["cached"] for r in records),
+                "errors": sum(r["error"] is not None for r in records),
+                "retries": sum(r["retries"] for r in records),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+                "completion_tokens": sum(r["completion_tokens"] for r in records),
+                "total_seconds": float(wall.sum()),
+                "mean_seconds": float(wall.mean()),
+                "p95_seconds": float(np.percentile(wall, 95)),
+                "queue_seconds": float(sum(r.get("queue_seconds", 0.0) for r in records))
+            })
+        return sorted(rows, key=lambda row: row["total_seconds"], reverse=True)
+
+    def to_jsonl(self, session_id: Optional[str] = None) -> str:
+        """In-memory records as JSONL, for download"""
+        return "".join(json.dumps(r) + "\n" for r in self.records(session_id))
+
+    def export_jsonl(self, path: str, session_id: Optional[str] = None) -> int:
+        """Write in-memory records to path and return how many were written"""
+        records = self.records(session_id)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+        return len(records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> TelemetryRecorder:
+    """Return the process-wide telemetry recorder"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = TelemetryRecorder()
+        return _telemetry
@@ -0,0 +1,145 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from agent.agentic_chatbot import ESGAdvisorSystem
+from agent.llm_scheduler import BATCH, INTERACTIVE
+from agent.pipeline import PipelineCancelled, StagePipeline, hash_kpi_data
+
+# What the dashboard precomputes for the chat page: 'off', 'metrics' (local
+# benchmark metrics only) or 'categories' (also data processing and the
+# category analyses, which spends LLM calls speculatively)
+WARMUP_MODE = os.getenv("ESG_ADVISOR_WARMUP", "metrics").lower()
+# KPI data must stay unchanged this long before LLM stages are started
+WARMUP_DELAY_SECONDS = float(os.getenv("ESG_ADVISOR_WARMUP_DELAY", "3"))
+# Longest the chat page waits for a warm-up before running the stages itself
+WARMUP_WAIT_SECONDS = float(os.getenv("ESG_ADVISOR_WARMUP_WAIT", "15"))
+
+
+class _WarmupJob:
+    def __init__(self, data_hash: str):
+        self.data_hash = data_hash
+        self.cancel = threading.Event()
+        # Set to skip the rest of the debounce delay
+        self.wake = threading.Event()
+        self.done = threading.Event()
+        self.status = "pending"
+        self.advisor: Optional[ESGAdvisorSystem] = None
+        self.thread: Optional[threading.Thread] = None
+
+
+class AdvisorWarmup:
+    """
+    Speculative background run of the advisor's first stages for one session.
+
+    The dashboard schedules a warm-up whenever it renders. Once the KPI data
+    has been unchanged for the debounce delay, the stages run at BATCH
+    priority into the session advisor's checkpoints, so the chat page finds
+    them ready. Scheduling different data cancels the stale run: no further
+    stages are started and only the LLM calls already in flight complete.
+    When the chat page needs the results, the remaining calls of the run are
+    made at INTERACTIVE priority.
+    """
+
+    def __init__(self,
+                advisor: ESGAdvisorSystem,
+                mode: str = WARMUP_MODE,
+                delay: float = WARMUP_DELAY_SECONDS):
+        self.advisor = advisor
+        self.mode = mode
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._job: Optional[_WarmupJob] = None
+
+    def schedule(self, kpi_data: Dict, industry: str):
+        """Warm up for this data unless that is already running or done"""
+        if self.mode not in ("metrics", "categories") or not kpi_data:
+            return
+        data_hash = hash_kpi_data(kpi_data, industry)
+        with self._lock:
+            if self._job is not None:
+                # A failed warm-up is not retried; the chat page runs the stages itself
+                if self._job.data_hash == data_hash and not self._job.cancel.is_set():
+                    return
+                self._job.cancel.set()
+                self._job.wake.set()
+            job = _WarmupJob(data_hash)
+            job.thread = threading.Thread(
+                target=self._run,
+                args=(job, {"type": "full_analysis", "data": dict(kpi_data)}, industry),
+                name="advisor-warmup",
+                daemon=True
+            )
+            self._job = job
+        job.thread.start()
+
+    def _run(self, job: _WarmupJob, input_data: Dict, industry: str):
+        try:
+            if self.mode == "categories":
+                job.wake.wait(self.delay)
+            if job.cancel.is_set():
+                job.status = "cancelled"
+                return
+            job.status = "running"
+
+            # A separate advisor keeps the chat run's progress and timings
+            # untouched; both share the session's checkpoints
+            background = ESGAdvisorSystem(use_cache=self.advisor.use_cache, session_id=self.advisor.session_id)
+            background.checkpoint_root = self.advisor.checkpoint_root
+            background.priority = INTERACTIVE if job.wake.is_set() and not job.cancel.is_set() else BATCH
+            job.advisor = background
+            pipeline = background.build_pipeline(input_data, industry, include_strategy=False)
+            if self.mode == "metrics":
+                pipeline = StagePipeline([pipeline.stages['metrics']])
+            pipeline.run(background.checkpoint_for(input_data, industry), cancel=job.cancel)
+            job.status = "ready"
+        except PipelineCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            logging.warning(f"Advisor warm-up failed: {str(e)}")
+            job.status = "failed"
+        finally:
+            job.done.set()
+
+    def status(self, kpi_data: Dict, industry: str) -> str:
+        """'idle', 'pending', 'running', 'ready', 'cancelled' or 'failed' for this data"""
+        with self._lock:
+            job = self._job
+        if job is None or not kpi_data or job.data_hash != hash_kpi_data(kpi_data, industry):
+            return "idle"
+        return job.status
+
+    def wait(self, kpi_data: Dict, industry: str, timeout: Optional[float] = None) -> bool:
+        """
+        Let a warm-up for this data finish before the chat page runs the pipeline
+
+        A pending warm-up starts immediately instead of waiting out its delay,
+        and its calls not yet queued are promoted to INTERACTIVE priority so
+        they are not starved by batch work. Warm-ups for other data are
+        cancelled.
+
+        Args:
+            timeout (float): Seconds to wait at most; None waits until done
+
+        Returns:
+            bool: True if a warm-up for this data is ready
+        """
+        with self._lock:
+            job = self._job
+        if job is None:
+            return False
+        if not kpi_data or job.data_hash != hash_kpi_data(kpi_data, industry):
+            self.cancel()
+            return False
+        job.wake.set()
+        if job.advisor is not None:
+            job.advisor.priority = INTERACTIVE
+        job.done.wait(timeout)
+        return job.status == "ready"
+
+    def cancel(self):
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel.set()
+                self._job.wake.set()
@@ -3,10 +3,19 @@ from page.home import HomePage
 from page.sector_kpis import KPIsPage
 from page.dashboard import DashboardPage
 from page.advisor import ChatInterface
+from page.admin import ADMIN_ENABLED, AdminPage
+from utils.text_evaluator import warm_up_scoring
 
 def main():
+    # Load the narrative scoring model and indexes before the first submit
+    warm_up_scoring()
     if "current_page" not in st.session_state:
         st.session_state.current_page = "home"
+    # The telemetry panel is opened directly with ?page=admin when an admin
+    # password is configured
+    if st.query_params.get("page") == "admin" and ADMIN_ENABLED:
+        st.session_state.current_page = "admin"
+        del st.query_params["page"]
 
     # Page routing
     if st.session_state.current_page == "home":
@@ -17,6 +26,8 @@ def main():
         DashboardPage().render()
     elif st.session_state.current_page == "chat":
         ChatInterface().render()
+    elif st.session_state.current_page == "admin":
+        AdminPage().render()
 
 if __name__ == "__main__":
     st.set_page_config(
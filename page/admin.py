@@ -0,0 +1,161 @@
+import hmac
+import os
+
+import streamlit as st
+import pandas as pd
+from agent.llm_scheduler import get_llm_scheduler
+from agent.report_jobs import DONE, FAILED, get_report_queue
+from agent.telemetry import TELEMETRY_LOG_PATH, get_telemetry
+from utils.scoring_queue import get_scoring_queue
+
+# The admin page shows every session's telemetry, so it is off unless a
+# shared secret is configured, and each browser session must enter it
+ADMIN_PASSWORD = os.getenv("ESG_ADMIN_PASSWORD", "")
+ADMIN_ENABLED = bool(ADMIN_PASSWORD)
+# Every company's reports can be read and LLM quota spent from the reports
+# tab, so it is shown only when explicitly enabled as well
+REPORTS_TAB_ENABLED = os.getenv("ESG_ADMIN_REPORTS", "off").lower() in ("1", "on", "true", "yes")
+
+class AdminPage:
+    """LLM usage panel: per-role and per-session latency, tokens and retries, and batch reports"""
+
+    def __init__(self):
+        self.telemetry = get_telemetry()
+        self.reports = get_report_queue() if REPORTS_TAB_ENABLED else None
+
+    def render(self):
+        col1, col2 = st.columns([1, 13])
+        with col1:
+            if st.button("← Back"):
+                st.session_state.current_page = "home"
+                st.rerun()
+        with col2:
+            st.markdown("### Admin")
+
+        if not self._authenticate():
+            return
+
+        if self.reports is None:
+            self._render_telemetry()
+            return
+        telemetry_tab, reports_tab = st.tabs(["Telemetry", "Batch reports"])
+        with telemetry_tab:
+            self._render_telemetry()
+        with reports_tab:
+            self._render_reports()
+
+    def _authenticate(self) -> bool:
+        """Ask for the admin secret once per session; the page is unavailable without one"""
+        if not ADMIN_ENABLED:
+            st.error("The admin page is disabled. Set ESG_ADMIN_PASSWORD to enable it.")
+            return False
+        if st.session_state.get('admin_authenticated'):
+            return True
+        password = st.text_input("Admin password", type="password")
+        if not password:
+            return False
+        if not hmac.compare_digest(password.encode("utf-8"), ADMIN_PASSWORD.encode("utf-8")):
+            st.error("Incorrect password.")
+            return False
+        st.session_state.admin_authenticated = True
+        st.rerun()
+
+    def _render_telemetry(self):
+        scheduler = get_llm_scheduler().stats()
+        st.caption(f"Scheduler: {scheduler['in_flight']} in flight, {scheduler['queued']} queued, "
+                f"{scheduler['tokens']} rate tokens available")
+        scoring = get_scoring_queue().stats()
+        st.caption(f"Narrative scoring: {scoring['queue_depth']} queued, {scoring['running']} running, "
+                f"{scoring['completed']} completed, {scoring['failed']} failed, {scoring['rejected']} rejected; "
+                f"wait p50 {scoring['wait_p50']:.2f}s, latency p50 {scoring['latency_p50']:.2f}s, "
+                f"p95 {scoring['latency_p95']:.2f}s")
+
+        records = self.telemetry.records()
+        if not records:
+            st.info("No agent calls recorded since the server started.")
+            return
+
+        sessions = sorted({r["session_id"] for r in records})
+        selected = st.selectbox("Session", ["All sessions"] + sessions)
+        session_id = None if selected == "All sessions" else selected
+
+        self._render_summary(self.telemetry.records(session_id))
+
+        st.markdown("#### By agent role")
+        st.dataframe(pd.DataFrame(self.telemetry.aggregate(("role",), session_id)),
+                    use_container_width=True, hide_index=True)
+
+        st.markdown("#### By session and role")
+        st.dataframe(pd.DataFrame(self.telemetry.aggregate(("session_id", "role"), session_id)),
+                    use_container_width=True, hide_index=True)
+
+        st.download_button(
+            "Export JSONL",
+            data=self.telemetry.to_jsonl(session_id),
+            file_name="llm_calls.jsonl",
+            mime="application/jsonl"
+        )
+        st.caption(f"The full call history is appended to {TELEMETRY_LOG_PATH}.")
+
+    def _render_summary(self, records):
+        calls = len(records)
+        cols = st.columns(5)
+        cols[0].metric("Calls", calls)
+        cols[1].metric("Cache hit rate", f"{sum(r['cached'] for r in records) / calls:.0%}")
+        cols[2].metric("Tokens", f"{sum(r['prompt_tokens'] + r['completion_tokens'] for r in records):,}")
+        cols[3].metric("Model time", f"{sum(r['wall_seconds'] for r in records):.1f}s")
+        cols[4].metric("Queue wait", f"{sum(r.get('queue_seconds', 0.0) for r in records):.1f}s")
+
+
+    def _render_reports(self):
+        counts = self.reports.counts()
+        cols = st.columns(4)
+        for col, (status, count) in zip(cols, counts.items()):
+            col.metric(status.title(), count)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            kpi_data = st.session_state.get('kpi_data')
+            industry = st.session_state.get('selected_industry')
+            if kpi_data and industry:
+                company = st.text_input("Company name", value="Current session")
+                if st.button("Queue report for current data"):
+                    self.reports.submit(company, industry, kpi_data)
+                    st.rerun()
+        with col2:
+            if self.reports.running:
+                st.caption(f"{self.reports.max_workers} report workers running in this server.")
+            elif counts['queued'] and st.button("Run queued jobs in this server"):
+                self.reports.start()
+                st.rerun()
+        st.caption("Overnight batches: `python -m agent.report_jobs submit companies.json` "
+                "then `python -m agent.report_jobs run`.")
+
+        jobs = self.reports.jobs()
+        if not jobs:
+            st.info("No report jobs yet.")
+            return
+        st.dataframe(pd.DataFrame(jobs).drop(columns=['artifact']), use_container_width=True, hide_index=True)
+
+        finished = {f"{job['company']} ({job['industry']}) - {job['id']}": job for job in jobs
+                    if job['status'] == DONE}
+        failed = [job for job in jobs if job['status'] == FAILED]
+        if failed:
+            retry = st.selectbox("Failed job", [job['id'] for job in failed])
+            if st.button("Retry"):
+                self.reports.retry(retry)
+                st.rerun()
+        if not finished:
+            return
+        selected = finished[st.selectbox("Finished report", list(finished))]
+        report = self.reports.artifacts.read(selected['id'])
+        if report is None:
+            st.warning("The report file is missing from the artifact store.")
+            return
+        col1, col2 = st.columns(2)
+        col1.download_button("Download Markdown", data=report,
+                            file_name=f"{selected['id']}.md", mime="text/markdown")
+        col2.download_button("Download HTML", data=self.reports.artifacts.read(selected['id'], "html") or "",
+                            file_name=f"{selected['id']}.html", mime="text/html")
+        with st.container(border=True):
+            st.markdown(report)
@@ -2,7 +2,15 @@ import streamlit as st
 import time
 import json
 from agent.agentic_chatbot import ESGAdvisorSystem
-from typing import Dict, Optional,Any
+from agent.answer_store import ANSWER_REUSE_ENABLED, get_answer_store
+from agent.pipeline import hash_kpi_data
+from agent.warmup import WARMUP_WAIT_SECONDS
+from agent.conversation_memory import ConversationMemory
+from agent.intent_router import get_intent_router
+from typing import Dict, Iterator, Optional, Any, Union
+
+# Messages kept for display; prompts only see ConversationMemory
+MAX_DISPLAY_MESSAGES = 100
 
 class ChatInterface:
     def __init__(self):
@@ -10,18 +18,22 @@ class ChatInterface:
 
     def _initialize_session_state(self):
         """Initialize all required session state variables"""
+        # Factories so defaults are only built for keys that are missing;
+        # the advisor's agents and LLM clients are shared process-wide
         required_states = {
-            'messages': [],
-            'advisor': ESGAdvisorSystem(),
-            'last_analysis': None,
-            'kpi_data': {},
-            'kpi_reference': self._load_kpi_reference(),
-            'current_category': None 
+            'messages': list,
+            'memory': ConversationMemory,
+            'advisor': ESGAdvisorSystem,
+            'last_analysis': lambda: None,
+            'current_analysis': lambda: None,
+            'kpi_data': dict,
+            'kpi_reference': self._load_kpi_reference,
+            'current_category': lambda: None
         }
         
-        for key, default_value in required_states.items():
+        for key, default_factory in required_states.items():
             if key not in st.session_state:
-                st.session_state[key] = default_value
+                st.session_state[key] = default_factory()
 
     def render(self):
         """Public method to render the complete chat interface"""
@@ -197,13 +209,28 @@ class ChatInterface:
                         f'<span class="category-indicator {message["category"]}">{message["category"].title()}</span>',
                         unsafe_allow_html=True
                     )
+                for stage_name, output in message.get("stages", []):
+                    self._show_stage_result(stage_name, output)
                 st.markdown(message["content"])
+                if message.get("timings"):
+                    self._show_timings(message["timings"])
+                if message.get("reused_for") and message is st.session_state.messages[-1]:
+                    if st.button("🔄 Answer from my data instead", key="fresh_answer"):
+                        # Drop the reused exchange and ask the agents again
+                        st.session_state.messages = st.session_state.messages[:-2]
+                        st.session_state.memory.remove_last(2)
+                        st.session_state.fresh_prompt = message["reused_for"]
+                        st.rerun()
         
         st.markdown('</div>', unsafe_allow_html=True)
         
     def _render_input(self):
         """Render chat input"""
-        if prompt := st.chat_input("Ask about your ESG metrics..."):
+        prompt = st.chat_input("Ask about your ESG metrics...")
+        fresh_prompt = st.session_state.pop('fresh_prompt', None)
+        if fresh_prompt:
+            self._handle_user_input(fresh_prompt, allow_reuse=False)
+        elif prompt:
             self._handle_user_input(prompt)
     def _filter_messages_by_category(self, messages):
         """Filter messages based on selected category"""
@@ -213,7 +240,7 @@ class ChatInterface:
         return [msg for msg in messages if 
                 "category" not in msg or 
                 msg["category"] == st.session_state.current_category]
-    def _handle_user_input(self, prompt: str):
+    def _handle_user_input(self, prompt: str, allow_reuse: bool = True):
             """Process user input and generate response"""
             # Add user message
             st.chat_message("user").markdown(prompt)
@@ -222,27 +249,56 @@ class ChatInterface:
                 "content": prompt
             })
             
-            # Get assistant response
-            response = self._get_response(prompt)
-            # Add assistant response
-            st.chat_message("assistant").markdown(response)
-            st.session_state.messages.append({
+            # Get assistant response, streaming it token by token when the advisor runs
+            st.session_state.stage_outputs = []
+            timings = None
+            with st.chat_message("assistant"):
+                response = self._get_response(prompt, allow_reuse)
+                if isinstance(response, str):
+                    st.markdown(response)
+                else:
+                    response = st.write_stream(response)
+                    timings = st.session_state.advisor.last_timings.to_markdown()
+                    self._show_timings(timings)
+            # Add assistant response; stage outputs and timings are kept so
+            # they are shown again after the rerun
+            message = {
                 "role": "assistant",
                 "content": response
-            })
+            }
+            if st.session_state.stage_outputs:
+                message["stages"] = st.session_state.stage_outputs
+            if timings:
+                message["timings"] = timings
+            if st.session_state.pop('reused_answer', False):
+                message["reused_for"] = prompt
+            st.session_state.messages.append(message)
+            st.session_state.messages = st.session_state.messages[-MAX_DISPLAY_MESSAGES:]
+            st.session_state.memory.add("user", prompt)
+            st.session_state.memory.add("assistant", response)
             
             st.rerun()
             
-    def _get_response(self, prompt: str) -> str:
-        """Generate response based on prompt type"""
-        # Detect prompt type
-        prompt_type = self._analyze_prompt(prompt)
+    def _get_response(self, prompt: str, allow_reuse: bool = True) -> Union[str, Iterator[str]]:
+        """Generate response based on prompt type, either as text or as a token stream"""
+        # Data, score and definition lookups are answered locally in milliseconds
+        prompt_type, answer = get_intent_router().route(
+            prompt,
+            st.session_state.kpi_data,
+            self._get_category_map()
+        )
+        if answer is not None:
+            return answer
+
+        # Near-identical questions asked in other sessions are answered instantly
+        if prompt_type == "question" and allow_reuse and ANSWER_REUSE_ENABLED:
+            reused = self._reuse_answer(prompt)
+            if reused is not None:
+                return reused
         
         try:
-            if prompt_type == "data_request":
-                return self._handle_data_request()
-                
-            elif prompt_type == "analysis_request":
+            self._await_warmup()
+            if prompt_type == "analysis_request":
                 return self._handle_analysis_request()
                 
             elif prompt_type == "question":
@@ -254,74 +310,138 @@ class ChatInterface:
         except Exception as e:
             st.error(f"Error generating response: {str(e)}")
             return "I encountered an error while processing your request. Please try again."
-            
-    def _analyze_prompt(self, prompt: str) -> str:
-        """Analyze prompt to determine type"""
-        # Simple keyword-based analysis
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ["analyze", "analysis", "evaluate", "assess"]):
-            return "analysis_request"
-            
-        if any(word in prompt_lower for word in ["data", "metrics", "kpis", "numbers"]):
-            return "data_request"
-            
-        if any(word in prompt_lower for word in ["why", "how", "what", "when", "where", "who"]):
-            return "question"
-            
-        return "chat"
-        
-    def _handle_data_request(self) -> str:
-        """Handle request for data overview"""
-        if not hasattr(st.session_state, 'kpi_data') or not st.session_state.kpi_data:
-            return ("I don't see any KPI data loaded yet. Please ensure your ESG metrics "
-                "are loaded in the dashboard before requesting an overview.")
-                
-        return st.session_state.advisor.run_analysis({
-            "type": "data_overview",
-            "data": st.session_state.kpi_data
-        },
-        st.session_state.selected_industry)
+
+    def _answer_context(self) -> str:
+        """Answer store context: answers grounded in KPI data are only reused for the same data"""
+        kpi_data = st.session_state.kpi_data
+        return hash_kpi_data(kpi_data, st.session_state.selected_industry) if kpi_data else ""
+
+    def _reuse_answer(self, prompt: str) -> Optional[str]:
+        """A stored answer to a similar question from this industry and data, with its provenance"""
+        industry = st.session_state.get('selected_industry')
+        if not industry:
+            return None
+        match = get_answer_store().lookup(industry, prompt, self._answer_context())
+        if match is None:
+            return None
+        hours = match['age_seconds'] / 3600
+        age = f"{hours:.0f} hour(s)" if hours < 48 else f"{hours / 24:.0f} day(s)"
+        st.session_state.reused_answer = True
+        return (f"{match['answer']}\n\n"
+                f"*Answer reused from a similar {industry} question asked {age} ago: "
+                f"\"{match['question']}\" ({match['similarity']:.0%} similar). "
+                "Use the button below for a freshly generated answer.*")
+
+    def _store_answer(self, stream: Iterator[str], prompt: str) -> Iterator[str]:
+        """Pass an answer stream through and keep the finished answer for reuse; only for prompts without chat history"""
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        answer = "".join(chunks)
+        industry = st.session_state.get('selected_industry')
+        # Only answers from a complete, successful run are kept
+        if ANSWER_REUSE_ENABLED and industry and answer and st.session_state.advisor.last_run_ok:
+            get_answer_store().put(industry, prompt, answer, self._answer_context())
+
+    def _await_warmup(self):
+        """Let the dashboard's background warm-up finish so its stage checkpoints are reused"""
+        warmup = st.session_state.get('advisor_warmup')
+        if warmup is None:
+            return
+        kpi_data = st.session_state.kpi_data
+        industry = st.session_state.get('selected_industry')
+        if warmup.status(kpi_data, industry) in ("pending", "running"):
+            with st.spinner("Finishing the analysis started on the dashboard..."):
+                ready = warmup.wait(kpi_data, industry, timeout=WARMUP_WAIT_SECONDS)
+            if not ready:
+                # Run the stages here instead; finished ones are reused from checkpoints
+                warmup.cancel()
+        else:
+            # Stops a warm-up for data that has changed since
+            warmup.wait(kpi_data, industry, timeout=0)
+
+    def _get_category_map(self) -> Dict[str, str]:
+        """ESG category per KPI of the selected industry"""
+        industry = st.session_state.get('selected_industry')
+        if not industry:
+            return {}
+        return st.session_state.advisor.data_manager.get_kpi_category_map(industry)
         
-    def _handle_analysis_request(self) -> str:
+    def _show_stage_result(self, stage_name: str, output: str):
+        """Show an intermediate advisor stage"""
+        with st.expander(f"✅ {stage_name}", expanded=False):
+            st.markdown(output)
+
+    def _collect_stage_result(self, stage_name: str, output: str):
+        """Surface an intermediate advisor stage as soon as it completes and keep it for the message"""
+        st.session_state.stage_outputs.append((stage_name, output))
+        self._show_stage_result(stage_name, output)
+
+    def _show_timings(self, timings: str):
+        """Show where an advisor run spent its time"""
+        with st.expander("⏱️ Timing breakdown", expanded=False):
+            st.markdown(timings)
+
+    def _remember_analysis(self, stream: Iterator[str]) -> Iterator[str]:
+        """Pass a response stream through and keep the full text as the current analysis"""
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        st.session_state.current_analysis = "".join(chunks)
+
+    def _handle_analysis_request(self) -> Union[str, Iterator[str]]:
         """Handle request for ESG analysis"""
         if not hasattr(st.session_state, 'kpi_data') or not st.session_state.kpi_data:
             return ("I don't see any KPI data loaded yet. Please load your ESG metrics "
                 "in the dashboard before requesting analysis.")
                 
-        response = st.session_state.advisor.run_analysis({
+        response = st.session_state.advisor.stream_analysis({
             "type": "full_analysis",
             "data": st.session_state.kpi_data
         },
-        st.session_state.selected_industry)
+        st.session_state.selected_industry,
+        on_stage_complete=self._collect_stage_result)
         
-        st.session_state.current_analysis = response
-        return response
+        return self._remember_analysis(response)
         
-    def _handle_question(self, prompt: str) -> str:
-        """Handle specific questions"""
-        if st.session_state.current_analysis:
-            return st.session_state.advisor.run_analysis({
+    def _handle_question(self, prompt: str) -> Union[str, Iterator[str]]:
+        """Handle specific questions, answered from the checkpointed analysis stages"""
+        if st.session_state.current_analysis or st.session_state.kpi_data:
+            history = st.session_state.memory.render()
+            response = st.session_state.advisor.stream_analysis({
                 "type": "question",
                 "question": prompt,
-                "context": st.session_state.current_analysis
+                "data": st.session_state.kpi_data,
+                "context": st.session_state.current_analysis,
+                "history": history
             },
-            st.session_state.selected_industry)
+            st.session_state.selected_industry,
+            on_stage_complete=self._collect_stage_result)
+            # Answers that drew on this chat's history are not offered to other sessions
+            if history:
+                return response
+            return self._store_answer(response, prompt)
         else:
             return ("I don't have any recent analysis context. Would you like me to "
                 "analyze your ESG metrics first?")
                 
-    def _handle_chat(self, prompt: str) -> str:
+    def _handle_chat(self, prompt: str) -> Union[str, Iterator[str]]:
         """Handle general chat"""
-        return st.session_state.advisor.run_analysis({
+        return st.session_state.advisor.stream_analysis({
             "type": "chat",
             "message": prompt,
-            "has_data": hasattr(st.session_state, 'kpi_data') and bool(st.session_state.kpi_data)
-        },st.session_state.selected_industry)
+            "data": st.session_state.kpi_data,
+            "has_data": bool(st.session_state.kpi_data),
+            "history": st.session_state.memory.render()
+        },st.session_state.selected_industry,
+        on_stage_complete=self._collect_stage_result)
         
     def _reset_chat(self):
         """Reset chat state"""
         st.session_state.messages = []
+        st.session_state.memory.clear()
         st.session_state.current_analysis = None
         
     def _load_kpi_data(self) -> Optional[Dict]:
@@ -376,5 +496,6 @@ class ChatInterface:
     def reset_conversation(self):
         """Reset the conversation and analysis state"""
         st.session_state.messages = []
+        st.session_state.memory.clear()
         st.session_state.last_analysis = None
         st.session_state.current_category = None
\ No newline at end of file
@@ -8,6 +8,9 @@ from typing import List,Optional
 import numpy as np
 from scipy.stats import gaussian_kde
 from utils.filename_utils import get_original_kpi_name, load_name_mapping
+from utils.kpi_scoring import normalize_kpi_value
+from agent.agentic_chatbot import ESGAdvisorSystem
+from agent.warmup import AdvisorWarmup
 import os
 import json
 
@@ -35,6 +38,9 @@ class DashboardPage:
         # Header with navigation
         self._render_header(sector)
 
+        # Users usually open the advisor next, so start its first stages now
+        self._start_advisor_warmup(sector, kpi_data)
+
         # Overview Cards
         self._render_overview_cards(categorized_data)
 
@@ -148,6 +154,14 @@ class DashboardPage:
                 st.session_state.current_page = "chat"
                 st.rerun()
 
+    def _start_advisor_warmup(self, sector, kpi_data):
+        """Precompute the advisor stages for this data in the background"""
+        if 'advisor' not in st.session_state:
+            st.session_state.advisor = ESGAdvisorSystem()
+        if 'advisor_warmup' not in st.session_state:
+            st.session_state.advisor_warmup = AdvisorWarmup(st.session_state.advisor)
+        st.session_state.advisor_warmup.schedule(kpi_data, sector)
+
     def _render_overview_cards(self, categorized_data):
         scores = {}
         for category, data in categorized_data.items():
@@ -238,25 +252,7 @@ class DashboardPage:
         Normalize KPI value to 0-100 scale and determine if inversion is needed
         Returns: (normalized_value, original_value, unit)
         """
-        ref = kpi_reference.get(kpi_name, {})
-        best = ref.get('best_score', 0)
-        worst = ref.get('worst_score', 0)
-        unit = ref.get('unit', '')
-        
-        if best == worst:
-            return 50, value, unit
-            
-        is_higher_better = best > worst
-        
-        if is_higher_better:
-            normalized = ((value - worst) / (best - worst)) * 100
-        else:
-            normalized = ((value - best) / (worst - best)) * 100
-            normalized = 100 - normalized
-            
-        normalized = max(0, min(100, normalized))
-        
-        return normalized, value, unit
+        return normalize_kpi_value(kpi_name, value, kpi_reference)
 
     def _render_kpi_comparison_chart(self, kpi_data: dict, category: str, kpi_reference: dict):
         st.markdown(f"### {category} KPI Performance")
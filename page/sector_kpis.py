@@ -9,7 +9,7 @@ from utils.kpi_calculator import KPICalculator
 from utils.logging import kpi_logger, log_dataframe_info
 import logging
 from utils.filename_utils import get_kpi_filename
-from utils.text_evaluator import score_esg_narrative
+from utils.scoring_queue import get_scoring_queue
 
 class KPIsPage:
     def __init__(self):
@@ -28,7 +28,8 @@ class KPIsPage:
             "uploaded_files": {},
             "column_mappings": {},
             "mapping_status": {},
-            "calculated_values": {}  # New: Store calculated KPI values
+            "calculated_values": {},  # New: Store calculated KPI values
+            "scoring_jobs": {}  # Pending narrative scoring futures by KPI
         }
         
         for var, default in session_vars.items():
@@ -41,6 +42,7 @@ class KPIsPage:
             return
 
         industry = st.session_state.selected_industry
+        self._collect_scoring_results()
         
         # File Management and Column Mapping Section
         with st.expander("Data Source Management", expanded=False):
@@ -88,6 +90,9 @@ class KPIsPage:
             with modal.container():
                 self._render_text_input_modal()
 
+        if st.session_state.scoring_jobs:
+            self._poll_scoring_jobs()
+
         st.markdown("""
             <style>
                 .footer-container {
@@ -340,7 +345,9 @@ class KPIsPage:
                             st.session_state.modal_state = True
                             st.session_state.current_kpi = kpi
                             st.rerun()
-                        if kpi_details["specification"] in st.session_state.calculated_values:
+                        if kpi_details["specification"] in st.session_state.scoring_jobs:
+                            st.markdown("**Status:** Scoring…")
+                        elif kpi_details["specification"] in st.session_state.calculated_values:
                                 result=round(st.session_state.calculated_values[kpi_details['specification']], 2)
                                 st.markdown(f"**Value:** {result}")
                                 st.session_state.kpi_data[kpi] = {
@@ -382,11 +389,32 @@ class KPIsPage:
                 if not value:
                     st.error("Please enter a response.")
                 else:
-                    value=score_esg_narrative(value,kpi)
-                    st.session_state.calculated_values[kpi] = value
-                    st.session_state.modal_state = False
-                    st.rerun()
+                    job = get_scoring_queue().submit(kpi, value)
+                    if job is None:
+                        st.error("The scoring queue is busy. Please try again in a moment.")
+                    else:
+                        st.session_state.scoring_jobs[kpi] = job
+                        st.session_state.modal_state = False
+                        st.rerun()
         with col2:
             if st.button("Cancel", key=f"cancel_{hash(kpi)}"):
                 st.session_state.modal_state = False
-                st.rerun()
\ No newline at end of file
+                st.rerun()
+
+    def _collect_scoring_results(self):
+        """Move finished narrative scores from the scoring queue into calculated_values"""
+        for kpi, job in list(st.session_state.scoring_jobs.items()):
+            if not job.done():
+                continue
+            del st.session_state.scoring_jobs[kpi]
+            try:
+                st.session_state.calculated_values[kpi] = job.result()
+            except Exception as e:
+                logging.error(f"Error scoring narrative for {kpi}: {str(e)}")
+                st.error(f"Could not score the answer for {kpi}: {str(e)}")
+
+    @st.fragment(run_every=1)
+    def _poll_scoring_jobs(self):
+        """Rerun the page once any pending narrative score is ready"""
+        if any(job.done() for job in st.session_state.scoring_jobs.values()):
+            st.rerun()
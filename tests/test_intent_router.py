@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from agent.intent_router import IntentRouter
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+ENERGY = "Energy consumption, total"
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter.from_files(
+        specs_path=os.path.join(DATA_DIR, "kpis.json"),
+        reference_path=os.path.join(DATA_DIR, "kpi_reference.json")
+    )
+
+
+@pytest.mark.parametrize("prompt, intent", [
+    # Open-ended prompts must reach the agents
+    ("Why is my water consumption so high?", "question"),
+    ("What are the current risks in our supply chain?", "question"),
+    ("List the main ESG regulations we should know about", "question"),
+    ("What value does ESG reporting bring to investors?", "question"),
+    ("Explain why our social performance is weak", "question"),
+    ("How are we doing on governance?", "question"),
+    ("Analyze my data", "analysis_request"),
+    # Explicit lookups are answered locally
+    (f"What is my score for {ENERGY}?", "score_lookup"),
+    ("Show my KPI data", "data_request"),
+    ("Show my environmental KPIs", "data_request"),
+    (f"What is my {ENERGY}?", "data_request"),
+    (f"What is {ENERGY}?", "definition"),
+    ("Thanks!", "chat"),
+])
+def test_classify(router, prompt, intent):
+    assert router.classify(prompt, router.find_kpis(prompt)) == intent
+
+
+def test_agent_intents_have_no_local_answer(router):
+    assert router.route("Why is my water consumption so high?", {ENERGY: 1500}) == ("question", None)
+
+
+def test_lookup_without_data_asks_for_kpis(router):
+    intent, answer = router.route("Show my KPI data", {})
+    assert intent == "data_request"
+    assert "I don't see any KPI data loaded yet" in answer
+
+
+def test_definition_answer(router):
+    intent, answer = router.route(f"What is {ENERGY}?", {})
+    assert intent == "definition"
+    assert f"**{ENERGY}**" in answer
+    assert "- Benchmark: best 500, worst 2500 MWh" in answer
+
+
+def test_score_answer(router):
+    answer = router._score_answer([ENERGY], {ENERGY: 1500}, {ENERGY: "Environmental"})
+    assert "**Category scores (0-100):** Environmental 50" in answer
+    assert f"| {ENERGY} | 50 | 1500 MWh |" in answer
+
+
+def test_score_answer_without_numeric_values(router):
+    answer = router._score_answer([ENERGY], {ENERGY: "not measured"}, None)
+    assert answer.startswith("None of those KPIs has a numeric value with a benchmark")
+
+
+def test_data_answer(router):
+    answer = router._data_answer([ENERGY], {ENERGY: {"value": 1500, "status": "verified"}},
+                                {ENERGY: "Environmental"})
+    assert answer.startswith("**Your KPI data** (1 KPI)")
+    assert f"| {ENERGY} | Environmental | 1500 MWh | verified |" in answer
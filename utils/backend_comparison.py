@@ -0,0 +1,123 @@
+"""
+Compare embedding backends for narrative scoring.
+
+Scores the same narratives with every backend and reports load time,
+encoding latency, peak Python memory and rank agreement with the first
+backend. Without an input file the graded exemplar bank is used, so rank
+agreement with the human grades is reported as well.
+
+    python -m utils.backend_comparison [--input narratives.csv] [--backends a b]
+"""
+import argparse
+import csv
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import text_evaluator
+from utils.embedding_backends import backend_names
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks with ties averaged, as used by Spearman's rho"""
+    order = np.argsort(values, kind="mergesort")
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(len(values), dtype=np.float64)
+    for value in np.unique(values):
+        tied = values == value
+        if tied.sum() > 1:
+            ranks[tied] = ranks[tied].mean()
+    return ranks
+
+
+def spearman(a: Sequence[float], b: Sequence[float]) -> float:
+    """Spearman rank correlation between two score lists"""
+    rank_a = _ranks(np.asarray(a, dtype=np.float64))
+    rank_b = _ranks(np.asarray(b, dtype=np.float64))
+    if rank_a.std() == 0 or rank_b.std() == 0:
+        return float("nan")
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def graded_exemplar_narratives() -> Tuple[List[Tuple[str, str]], List[float]]:
+    """(kpi_name, text) pairs and grades from the reference and exemplar answers"""
+    items, grades = [], []
+    for kpi_name, (best_response, worst_response) in text_evaluator.load_answer_ranges().items():
+        items.extend([(kpi_name, best_response), (kpi_name, worst_response)])
+        grades.extend([1.0, 0.0])
+    for kpi_name, exemplars in text_evaluator.load_exemplar_bank().items():
+        for grade, text in exemplars:
+            items.append((kpi_name, text))
+            grades.append(grade)
+    return items, grades
+
+
+def compare_backends(items: List[Tuple[str, str]],
+                    backends: Sequence[str],
+                    grades: Optional[Sequence[float]] = None,
+                    method: str = "anchors") -> Dict[str, Dict[str, float]]:
+    """
+    Score items with each backend and collect latency, memory and agreement.
+
+    The default method is 'anchors' because the exemplar method would score
+    the exemplars themselves against their own bank.
+
+    Args:
+        items (List[Tuple[str, str]]): (kpi_name, text) pairs
+        backends (Sequence[str]): Backend names; the first is the reference
+        grades (Sequence[float]): Optional known grades for items
+        method (str): Scoring method passed to score_esg_narratives
+
+    Returns:
+        Dict[str, Dict[str, float]]: Metrics per backend
+    """
+    results = {}
+    reference_scores = None
+    for name in backends:
+        tracemalloc.start()
+        start = time.perf_counter()
+        text_evaluator.set_backend(name)
+        text_evaluator.get_exemplar_index()
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = text_evaluator.score_esg_narratives(items, use_cache=False, method=method)
+        score_seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if reference_scores is None:
+            reference_scores = scores
+        metrics = {
+            "load_seconds": load_seconds,
+            "ms_per_text": score_seconds / len(items) * 1000,
+            "peak_python_mb": peak_bytes / 1024 / 1024,
+            "rank_agreement": spearman(scores, reference_scores)
+        }
+        if grades is not None:
+            metrics["rank_agreement_with_grades"] = spearman(scores, grades)
+        results[name] = metrics
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare narrative embedding backends")
+    parser.add_argument("--input", metavar="CSV", help="CSV with 'kpi' and 'text' columns")
+    parser.add_argument("--backends", nargs="+", default=backend_names())
+    parser.add_argument("--method", default="anchors", choices=["anchors", "exemplars"])
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8", newline="") as f:
+            narratives = [(row["kpi"], row["text"]) for row in csv.DictReader(f)]
+        known_grades = None
+    else:
+        narratives, known_grades = graded_exemplar_narratives()
+
+    print(f"Comparing {len(narratives)} narratives, reference backend: {args.backends[0]}")
+    for backend_name, backend_metrics in compare_backends(
+            narratives, args.backends, known_grades, args.method).items():
+        formatted = ", ".join(f"{key}={value:.3f}" for key, value in backend_metrics.items())
+        print(f"{backend_name:>22}: {formatted}")
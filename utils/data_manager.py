@@ -1,3 +1,4 @@
+import json
 from typing import Dict, List, Optional
 import pandas as pd
 import streamlit as st
@@ -18,6 +19,9 @@ class DataManager:
         
         # Dictionary to store KPI types
         self.kpi_types = {}
+        # Category maps per industry, built on first use
+        self._category_maps = {}
+        self._kpi_reference = None
         
     def get_industries(self) -> List[str]:
         """Get list of unique industries"""
@@ -40,6 +44,28 @@ class DataManager:
                 
         return categorized_kpis
     
+    def get_kpi_category_map(self, industry: str) -> Dict[str, str]:
+        """Map each KPI specification and KPI name of an industry to its ESG category"""
+        if industry in self._category_maps:
+            return self._category_maps[industry]
+        industry_data = self.df[self.df['Industry'] == industry]
+        category_map = {}
+        for _, row in industry_data.iterrows():
+            category = self.cluster_to_category.get(row['Cluster'])
+            if category:
+                category_map[row['Specification']] = category
+                if row['KPI Name']:
+                    category_map.setdefault(row['KPI Name'], category)
+        self._category_maps[industry] = category_map
+        return category_map
+    
+    def get_kpi_reference(self) -> Dict:
+        """Best and worst reference scores and unit per KPI, loaded once"""
+        if self._kpi_reference is None:
+            with open('data/kpi_reference.json', 'r') as f:
+                self._kpi_reference = json.load(f)
+        return self._kpi_reference
+    
     def get_kpi_details(self, kpi_name: str) -> Dict:
         """Get details for a specific KPI"""
         kpi_data = self.df[self.df['Specification'] == kpi_name].iloc[0]
@@ -0,0 +1,123 @@
+import hashlib
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_BACKEND = "sentence-transformer"
+SENTENCE_TRANSFORMER_MODEL = 'all-MiniLM-L6-v2'
+HASHED_TFIDF_DIM = 4096
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class EmbeddingBackend:
+    """
+    Interface for text encoders used by narrative scoring.
+
+    Subclasses set model_id, which keys the embedding cache and the on-disk
+    anchor index, and implement encode.
+    """
+
+    name = "base"
+    model_id = "base"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into a (n, dim) float32 array"""
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """SentenceTransformer encoder; torch and the model are loaded on first use"""
+
+    name = "sentence-transformer"
+
+    def __init__(self, model_name: str = SENTENCE_TRANSFORMER_MODEL):
+        self.model_name = model_name
+        self.model_id = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            return self._model
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = self._get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class HashedTfidfBackend(EmbeddingBackend):
+    """
+    Dependency-free TF-IDF encoder using the hashing trick.
+
+    Unigrams and bigrams are hashed into dim buckets with sublinear term
+    frequency, weighted by IDF fitted on a reference corpus, and L2
+    normalized. It needs no model download and encodes in microseconds.
+    """
+
+    name = "hashed-tfidf"
+
+    def __init__(self, corpus: Iterable[str] = (), dim: int = HASHED_TFIDF_DIM):
+        self.dim = dim
+        corpus = list(corpus)
+        self.idf = self._fit_idf(corpus)
+        corpus_hash = hashlib.sha256("\0".join(corpus).encode("utf-8")).hexdigest()[:8]
+        self.model_id = f"hashed-tfidf-{dim}-{corpus_hash}"
+
+    def _buckets(self, text: str) -> Counter:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return Counter(zlib.crc32(term.encode("utf-8")) % self.dim for term in terms)
+
+    def _fit_idf(self, corpus: List[str]) -> np.ndarray:
+        document_frequency = np.zeros(self.dim, dtype=np.float32)
+        for text in corpus:
+            document_frequency[list(self._buckets(text))] += 1
+        # Smoothed IDF; buckets unseen in the corpus get the maximum weight
+        return np.log((1 + len(corpus)) / (1 + document_frequency)).astype(np.float32) + 1
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for bucket, count in self._buckets(text).items():
+                embeddings[row, bucket] = 1 + math.log(count)
+        embeddings *= self.idf
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1.0, norms)
+
+
+BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    HashedTfidfBackend.name: HashedTfidfBackend,
+}
+
+
+def create_backend(name: str, corpus: Optional[Iterable[str]] = None) -> EmbeddingBackend:
+    """
+    Build an embedding backend by name.
+
+    Args:
+        name (str): One of BACKENDS
+        corpus (Iterable[str]): Reference texts used to fit corpus statistics
+            for backends that need them
+
+    Returns:
+        EmbeddingBackend: The configured backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    if name == HashedTfidfBackend.name:
+        return HashedTfidfBackend(corpus or ())
+    return BACKENDS[name]()
+
+
+def backend_names() -> List[str]:
+    return list(BACKENDS)
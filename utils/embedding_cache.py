@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_CACHE_DIR = os.path.join("session_files", "embedding_cache")
+DEFAULT_MAX_ENTRIES = 512
+# Embedding files kept on disk; least recently used ones are removed beyond this
+DEFAULT_MAX_DISK_ENTRIES = int(os.getenv("ESG_EMBEDDING_CACHE_MAX_FILES", "20000"))
+# Eviction trims the disk cache to this fraction of its bound, so it is not rescanned on every write
+DISK_EVICTION_TARGET = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a narrative so whitespace-only edits map to the same key"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed by model id and normalized text hash.
+
+    Recently used embeddings live in an in-memory LRU bounded by max_entries;
+    every embedding is also written to disk so it survives restarts and is
+    shared between sessions. The disk cache is bounded by max_disk_entries:
+    a file's modification time is refreshed when it is read, and once the
+    bound is exceeded the least recently used files are deleted.
+    """
+
+    def __init__(self,
+                cache_dir: str = EMBEDDING_CACHE_DIR,
+                max_entries: int = DEFAULT_MAX_ENTRIES,
+                max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._eviction_lock = threading.Lock()
+        # Counted from the directory on the first write
+        self._disk_entries: Optional[int] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+    @staticmethod
+    def make_key(text: str, model_id: str) -> str:
+        payload = f"{model_id}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str, model_id: str) -> str:
+        model_slug = model_id.replace("/", "_")
+        return os.path.join(self.cache_dir, model_slug, key[:2], f"{key}.npy")
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, model_id: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for text, or None on a miss"""
+        key = self.make_key(text, model_id)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        path = self._disk_path(key, model_id)
+        if os.path.exists(path):
+            try:
+                embedding = np.load(path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Discarding unreadable embedding cache entry {path}: {str(e)}")
+            else:
+                try:
+                    # Marks the file as recently used for disk eviction
+                    os.utime(path)
+                except OSError:
+                    pass
+                with self._lock:
+                    self._remember(key, embedding)
+                    self.disk_hits += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, model_id: str, embedding: np.ndarray):
+        """Store an embedding in memory and on disk"""
+        key = self.make_key(text, model_id)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, embedding)
+
+        path = self._disk_path(key, model_id)
+        is_new = not os.path.exists(path)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp_path, embedding)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not persist embedding cache entry: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_entries is None:
+                self._disk_entries = len(self._disk_files())
+            elif is_new:
+                self._disk_entries += 1
+            over_bound = self._disk_entries > self.max_disk_entries
+        if over_bound:
+            self._evict_disk()
+
+    def _disk_files(self) -> List[Tuple[float, str]]:
+        """(modification time, path) of every embedding file on disk"""
+        files = []
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".npy") and not name.endswith(".tmp.npy"):
+                    path = os.path.join(directory, name)
+                    try:
+                        files.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+        return files
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk cache is below its bound"""
+        if not self._eviction_lock.acquire(blocking=False):
+            return
+        try:
+            files = sorted(self._disk_files())
+            excess = len(files) - int(self.max_disk_entries * DISK_EVICTION_TARGET)
+            removed = 0
+            for _, path in files[:max(0, excess)]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    continue
+            with self._lock:
+                self._disk_entries = len(files) - removed
+                self.disk_evictions += removed
+            if removed:
+                logging.info(f"Evicted {removed} embedding cache file(s) from {self.cache_dir}")
+        finally:
+            self._eviction_lock.release()
+
+    def get_many(self, texts: List[str], model_id: str) -> List[Optional[np.ndarray]]:
+        return [self.get(text, model_id) for text in texts]
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the overall hit rate"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_entries": self._disk_entries,
+                "max_disk_entries": self.max_disk_entries,
+                "disk_evictions": self.disk_evictions
+            }
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
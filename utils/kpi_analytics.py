@@ -0,0 +1,130 @@
+from typing import Dict, List, Optional
+
+from utils.kpi_scoring import normalize_kpi_value, numeric_kpi_value
+
+# Number of weakest KPIs listed in the summary
+WORST_N = 5
+
+
+def _round(value: float) -> float:
+    return round(float(value), 4)
+
+
+def kpi_benchmark(kpi_name: str, value: float, reference: Dict) -> Dict:
+    """
+    Position of one KPI value between the worst and best reference scores.
+
+    'position' is the 0-100 percentile position inside the reference band
+    (0 at worst, 100 at best); 'gap_to_best' is how far the value still has
+    to move, in the KPI's unit, and 'margin_over_worst' how far it is from
+    the worst score.
+    """
+    best = reference['best_score']
+    worst = reference['worst_score']
+    position, _, unit = normalize_kpi_value(kpi_name, value, {kpi_name: reference})
+    higher_is_better = best > worst
+    return {
+        'value': _round(value),
+        'unit': unit,
+        'best': best,
+        'worst': worst,
+        'direction': 'higher is better' if higher_is_better else 'lower is better',
+        'position': _round(position),
+        'gap_to_best': _round(max(0.0, best - value) if higher_is_better else max(0.0, value - best)),
+        'margin_over_worst': _round(value - worst if higher_is_better else worst - value)
+    }
+
+
+def analyze_kpis(kpi_data: Dict,
+                kpi_reference: Dict,
+                category_map: Optional[Dict[str, str]] = None,
+                worst_n: int = WORST_N) -> Dict:
+    """
+    Deterministic benchmark analysis of a company's KPI values.
+
+    Args:
+        kpi_data (Dict): KPI values keyed by KPI name
+        kpi_reference (Dict): Best and worst scores and unit per KPI
+        category_map (Dict[str, str]): ESG category per KPI name
+        worst_n (int): How many of the weakest KPIs to list
+
+    Returns:
+        Dict: 'kpis' (benchmark per KPI), 'categories' (mean position,
+            delta to the overall mean and weakest KPI per category),
+            'worst_kpis', 'overall_position' and 'unbenchmarked' KPI names
+    """
+    category_map = category_map or {}
+    kpis, unbenchmarked = {}, []
+    for kpi_name, entry in kpi_data.items():
+        value = numeric_kpi_value(entry)
+        reference = kpi_reference.get(kpi_name)
+        if value is None or not reference or reference.get('best_score') == reference.get('worst_score'):
+            unbenchmarked.append(kpi_name)
+            continue
+        kpis[kpi_name] = {
+            'category': category_map.get(kpi_name, 'Other'),
+            **kpi_benchmark(kpi_name, value, reference)
+        }
+
+    positions = [kpi['position'] for kpi in kpis.values()]
+    overall = sum(positions) / len(positions) if positions else None
+
+    categories = {}
+    for kpi_name, kpi in kpis.items():
+        categories.setdefault(kpi['category'], []).append((kpi['position'], kpi_name))
+    category_summary = {}
+    for category, scored in sorted(categories.items()):
+        mean = sum(position for position, _ in scored) / len(scored)
+        category_summary[category] = {
+            'kpis': len(scored),
+            'mean_position': _round(mean),
+            'delta_to_overall': _round(mean - overall),
+            'weakest_kpi': min(scored)[1]
+        }
+
+    worst: List[str] = sorted(kpis, key=lambda name: kpis[name]['position'])[:worst_n]
+    return {
+        'overall_position': _round(overall) if overall is not None else None,
+        'categories': category_summary,
+        'worst_kpis': [
+            {'kpi': name, 'position': kpis[name]['position'], 'gap_to_best': kpis[name]['gap_to_best']}
+            for name in worst
+        ],
+        'kpis': kpis,
+        'unbenchmarked': unbenchmarked
+    }
+
+
+def category_view(analytics: Dict, category: str) -> Dict:
+    """The part of analyze_kpis output relevant to one ESG category"""
+    category = category.lower()
+    kpis = {
+        name: {key: value for key, value in kpi.items() if key != 'category'}
+        for name, kpi in analytics['kpis'].items()
+        if kpi['category'].lower() == category
+    }
+    summary = next(
+        (value for key, value in analytics['categories'].items() if key.lower() == category),
+        None
+    )
+    return {'summary': summary, 'kpis': kpis}
+
+
+def analytics_markdown(analytics: Dict) -> str:
+    """Human-readable summary of analyze_kpis output"""
+    lines = []
+    if analytics['overall_position'] is not None:
+        lines.append(f"**Overall position:** {analytics['overall_position']:.0f}/100 "
+                    "(0 = worst reference score, 100 = best)\n")
+    if analytics['categories']:
+        lines += ["| Category | KPIs | Mean position | Δ to overall | Weakest KPI |",
+                "|---|---:|---:|---:|---|"]
+        lines += [f"| {category} | {summary['kpis']} | {summary['mean_position']:.0f} | "
+                f"{summary['delta_to_overall']:+.0f} | {summary['weakest_kpi']} |"
+                for category, summary in analytics['categories'].items()]
+    if analytics['worst_kpis']:
+        lines.append("\n**Weakest KPIs:** " + "; ".join(
+            f"{item['kpi']} ({item['position']:.0f}/100)" for item in analytics['worst_kpis']))
+    if analytics['unbenchmarked']:
+        lines.append(f"\n{len(analytics['unbenchmarked'])} KPI(s) have no numeric benchmark.")
+    return "\n".join(lines) or "No KPI values could be benchmarked."
@@ -0,0 +1,54 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+def kpi_value(entry: Any) -> Any:
+    """KPI value from a kpi_data entry, which is either the value or {'value': ..., 'status': ...}"""
+    if isinstance(entry, dict):
+        return entry.get('value')
+    return entry
+
+
+def normalize_kpi_value(kpi_name: str, value: float, kpi_reference: Dict) -> Tuple[float, float, str]:
+    """
+    Normalize KPI value to 0-100 scale, inverting KPIs where lower is better
+
+    Args:
+        kpi_name (str): KPI name as used in kpi_reference.json
+        value (float): Raw KPI value
+        kpi_reference (Dict): Best and worst scores and unit per KPI
+
+    Returns:
+        tuple: (normalized_value, original_value, unit)
+    """
+    ref = kpi_reference.get(kpi_name, {})
+    best = ref.get('best_score', 0)
+    worst = ref.get('worst_score', 0)
+    unit = ref.get('unit', '')
+
+    if best == worst:
+        return 50, value, unit
+
+    is_higher_better = best > worst
+
+    if is_higher_better:
+        normalized = ((value - worst) / (best - worst)) * 100
+    else:
+        normalized = ((value - best) / (worst - best)) * 100
+        normalized = 100 - normalized
+
+    normalized = max(0, min(100, normalized))
+
+    return normalized, value, unit
+
+
+def numeric_kpi_value(entry: Any) -> Optional[float]:
+    """KPI value as a float, or None for narrative and missing values"""
+    value = kpi_value(entry)
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.text_evaluator import score_esg_narrative
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+LATENCY_WINDOW = 200
+
+
+class NarrativeScoringQueue:
+    """
+    Bounded worker pool that scores narratives off the Streamlit script thread.
+
+    At most max_pending jobs may be queued or running at once; submit returns
+    None when the queue is full so the caller can ask the user to retry.
+    """
+
+    def __init__(self,
+                max_workers: int = DEFAULT_MAX_WORKERS,
+                max_pending: int = DEFAULT_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="narrative-scoring"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_times = deque(maxlen=LATENCY_WINDOW)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def _run(self, kpi_name: str, text: str, submitted_at: float) -> float:
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._wait_times.append(started_at - submitted_at)
+        try:
+            score = score_esg_narrative(text, kpi_name)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            logging.error(f"Narrative scoring failed for {kpi_name}", exc_info=True)
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return score
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._latencies.append(time.perf_counter() - submitted_at)
+
+    def submit(self, kpi_name: str, text: str) -> Optional[Future]:
+        """Queue a narrative for scoring, returning None if the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self._pending += 1
+        return self._executor.submit(self._run, kpi_name, text, time.perf_counter())
+
+    def stats(self) -> Dict[str, float]:
+        """Return queue depth and wait/total latency figures in seconds"""
+        with self._lock:
+            wait_times = np.asarray(self._wait_times) if self._wait_times else np.zeros(1)
+            latencies = np.asarray(self._latencies) if self._latencies else np.zeros(1)
+            return {
+                "queue_depth": self._pending - self._running,
+                "running": self._running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "wait_p50": float(np.percentile(wait_times, 50)),
+                "latency_p50": float(np.percentile(latencies, 50)),
+                "latency_p95": float(np.percentile(latencies, 95))
+            }
+
+
+_scoring_queue = None
+_scoring_queue_lock = threading.Lock()
+
+
+def get_scoring_queue() -> NarrativeScoringQueue:
+    """Return the process-wide scoring queue shared by all sessions"""
+    global _scoring_queue
+    with _scoring_queue_lock:
+        if _scoring_queue is None:
+            _scoring_queue = NarrativeScoringQueue()
+        return _scoring_queue
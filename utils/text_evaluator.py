@@ -1,37 +1,557 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-import torch
+import hashlib
 import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.embedding_backends import DEFAULT_BACKEND, EmbeddingBackend, create_backend
+from utils.embedding_cache import get_embedding_cache
+from utils.vector_index import build_vector_index
 
-def get_answer_range(kpi_name):
-    with open("data\kpi_reference.json","r") as file:
+# Backend used for narrative embeddings: 'sentence-transformer' or 'hashed-tfidf'
+EMBEDDING_BACKEND = os.getenv("ESG_EMBEDDING_BACKEND", DEFAULT_BACKEND)
+KPI_REFERENCE_PATH = os.path.join("data", "kpi_reference.json")
+KPI_EXEMPLARS_PATH = os.path.join("data", "kpi_exemplars.json")
+ANCHOR_INDEX_DIR = os.path.join("data", "embeddings")
+# Bump when the on-disk layout of the anchor array or the way anchors are
+# embedded changes
+ANCHOR_INDEX_VERSION = 2
+DEFAULT_BATCH_SIZE = 32
+# MiniLM truncates at 256 word pieces; ~160 words stays safely inside that
+CHUNK_WORDS = 160
+CHUNK_OVERLAP_WORDS = 40
+# Nearest exemplars used per narrative and softmax temperature over their similarities
+EXEMPLAR_NEIGHBOURS = 5
+EXEMPLAR_TEMPERATURE = 0.05
+
+_backend = None
+_backend_lock = threading.Lock()
+_reference_index = None
+_reference_index_lock = threading.Lock()
+_exemplar_index = None
+_exemplar_index_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_lock = threading.Lock()
+
+
+def _reference_corpus() -> List[str]:
+    """Reference and exemplar answers, used to fit corpus-based backends"""
+    corpus = [text for pair in load_answer_ranges().values() for text in pair]
+    corpus.extend(text for exemplars in load_exemplar_bank().values() for _, text in exemplars)
+    return corpus
+
+
+def get_backend() -> EmbeddingBackend:
+    """Return the process-wide embedding backend, creating it on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(EMBEDDING_BACKEND, corpus=_reference_corpus())
+        return _backend
+
+
+def set_backend(name: str) -> EmbeddingBackend:
+    """Switch the embedding backend and drop indexes built with the previous one"""
+    global _backend, _reference_index, _exemplar_index
+    backend = create_backend(name, corpus=_reference_corpus())
+    with _backend_lock:
+        _backend = backend
+    with _reference_index_lock:
+        _reference_index = None
+    with _exemplar_index_lock:
+        _exemplar_index = None
+    return backend
+
+
+def _encode_uncached(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(get_backend().encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+def encode_texts(texts: List[str],
+                batch_size: int = DEFAULT_BATCH_SIZE,
+                use_cache: bool = True) -> np.ndarray:
+    """
+    Encode a list of texts into a (n, dim) float32 array.
+
+    With use_cache, texts seen before (after whitespace normalization) are
+    served from the embedding cache and only the misses reach the encoder.
+    """
+    if not use_cache:
+        return _encode_uncached(texts, batch_size)
+
+    cache = get_embedding_cache()
+    model_id = get_backend().model_id
+    cached = cache.get_many(texts, model_id)
+    missing = [i for i, embedding in enumerate(cached) if embedding is None]
+    if missing:
+        fresh = _encode_uncached([texts[i] for i in missing], batch_size)
+        for i, embedding in zip(missing, fresh):
+            cache.put(texts[i], model_id, embedding)
+            cached[i] = embedding
+    return np.stack(cached) if cached else np.zeros((0, 0), dtype=np.float32)
+
+
+def split_into_chunks(text: str,
+                    chunk_words: int = CHUNK_WORDS,
+                    overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Split text into overlapping word windows that fit the encoder window"""
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [" ".join(words)]
+
+    stride = chunk_words - overlap_words
+    chunks = []
+    for start in range(0, len(words), stride):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def embed_documents(texts: List[str],
+                    batch_size: int = DEFAULT_BATCH_SIZE,
+                    use_cache: bool = True) -> np.ndarray:
+    """
+    Embed whole documents regardless of length.
+
+    Each text is split into overlapping chunks, the chunks of all texts are
+    encoded together, and each document embedding is the word-count weighted
+    mean of its chunk embeddings.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    all_chunks = []
+    weights = []
+    offsets = []
+    for text in texts:
+        chunks = split_into_chunks(text)
+        offsets.append(len(all_chunks))
+        all_chunks.extend(chunks)
+        weights.extend(max(len(chunk.split()), 1) for chunk in chunks)
+
+    chunk_embeddings = encode_texts(all_chunks, batch_size=batch_size, use_cache=use_cache)
+    weights = np.asarray(weights, dtype=np.float32)
+    weighted_sums = np.add.reduceat(chunk_embeddings * weights[:, None], offsets, axis=0)
+    weight_totals = np.add.reduceat(weights, offsets)
+    return weighted_sums / weight_totals[:, None]
+
+
+def load_answer_ranges(reference_path: str = KPI_REFERENCE_PATH) -> Dict[str, Tuple[str, str]]:
+    """Return {kpi_name: (best_response, worst_response)} for all qualitative KPIs"""
+    with open(reference_path, "r", encoding="utf-8") as file:
         kpi_reference = json.load(file)
-    print(kpi_reference)
-    return kpi_reference[kpi_name]["best_response"], kpi_reference[kpi_name]["worst_response"]
-def score_esg_narrative(user_input, kpi_name):
+    return {
+        kpi_name: (ref["best_response"], ref["worst_response"])
+        for kpi_name, ref in kpi_reference.items()
+        if "best_response" in ref and "worst_response" in ref
+    }
+
+
+def get_answer_range(kpi_name):
+    return load_answer_ranges()[kpi_name]
+
+
+class ReferenceEmbeddingIndex:
+    """
+    Precomputed best/worst anchor embeddings for every qualitative KPI.
+
+    The anchors are stored as a single (n_kpis, 2, dim) float32 array next to a
+    JSON manifest recording the model, layout version and a hash of the anchor
+    texts. The array is memory-mapped on load and rebuilt only when the
+    manifest no longer matches the reference file.
+    """
+
+    def __init__(self,
+                index_dir: str = ANCHOR_INDEX_DIR,
+                reference_path: str = KPI_REFERENCE_PATH,
+                model_name: Optional[str] = None):
+        self.index_dir = index_dir
+        self.reference_path = reference_path
+        self.model_name = model_name or get_backend().model_id
+        self.anchors: Optional[np.ndarray] = None
+        self.kpi_positions: Dict[str, int] = {}
+
+    @property
+    def _basename(self) -> str:
+        model_slug = self.model_name.replace("/", "_")
+        return f"anchors_{model_slug}_v{ANCHOR_INDEX_VERSION}"
+
+    @property
+    def array_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self._basename}.npy")
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self._basename}.json")
+
+    @staticmethod
+    def _hash_ranges(answer_ranges: Dict[str, Tuple[str, str]]) -> str:
+        payload = json.dumps(sorted(answer_ranges.items()), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read_manifest(self) -> Optional[Dict]:
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.array_path)):
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def build(self, answer_ranges: Dict[str, Tuple[str, str]]) -> Dict:
+        """Encode all anchors and write the array and manifest to disk"""
+        kpi_names = sorted(answer_ranges)
+        texts = []
+        for kpi_name in kpi_names:
+            texts.extend(answer_ranges[kpi_name])
+
+        embeddings = embed_documents(texts, use_cache=False)
+        anchors = embeddings.reshape(len(kpi_names), 2, -1)
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_array = f"{self.array_path}.tmp.npy"
+        np.save(tmp_array, anchors)
+        os.replace(tmp_array, self.array_path)
+
+        manifest = {
+            "version": ANCHOR_INDEX_VERSION,
+            "model": self.model_name,
+            "reference_hash": self._hash_ranges(answer_ranges),
+            "kpis": kpi_names,
+            "shape": list(anchors.shape)
+        }
+        tmp_manifest = f"{self.manifest_path}.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_manifest, self.manifest_path)
+        return manifest
+
+    def load(self) -> "ReferenceEmbeddingIndex":
+        """Memory-map the anchor array, rebuilding it if it is missing or stale"""
+        answer_ranges = load_answer_ranges(self.reference_path)
+        manifest = self._read_manifest()
+        if (manifest is None
+                or manifest.get("version") != ANCHOR_INDEX_VERSION
+                or manifest.get("model") != self.model_name
+                or manifest.get("reference_hash") != self._hash_ranges(answer_ranges)):
+            manifest = self.build(answer_ranges)
+
+        self.anchors = np.load(self.array_path, mmap_mode="r")
+        self.kpi_positions = {name: i for i, name in enumerate(manifest["kpis"])}
+        return self
+
+    def get(self, kpi_name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (best_embedding, worst_embedding) for a KPI"""
+        if kpi_name not in self.kpi_positions:
+            raise KeyError(f"No reference answers found for KPI: {kpi_name}")
+        pair = self.anchors[self.kpi_positions[kpi_name]]
+        return pair[0], pair[1]
+
+    def get_many(self, kpi_names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return stacked (best, worst) anchor matrices aligned with kpi_names"""
+        missing = [name for name in kpi_names if name not in self.kpi_positions]
+        if missing:
+            raise KeyError(f"No reference answers found for KPI: {missing[0]}")
+        positions = np.fromiter(
+            (self.kpi_positions[name] for name in kpi_names),
+            dtype=np.int64,
+            count=len(kpi_names)
+        )
+        pairs = np.asarray(self.anchors[positions])
+        return pairs[:, 0], pairs[:, 1]
+
+
+def get_reference_index() -> ReferenceEmbeddingIndex:
+    """Return the process-wide anchor index, loading it on first use"""
+    global _reference_index
+    with _reference_index_lock:
+        if _reference_index is None:
+            _reference_index = ReferenceEmbeddingIndex().load()
+        return _reference_index
+
+
+def load_exemplar_bank(exemplars_path: str = KPI_EXEMPLARS_PATH) -> Dict[str, List[Tuple[float, str]]]:
+    """Return {kpi_name: [(grade, text), ...]} from the graded exemplar file"""
+    if not os.path.exists(exemplars_path):
+        return {}
+    with open(exemplars_path, "r", encoding="utf-8") as f:
+        raw_bank = json.load(f)
+    return {
+        kpi_name: [(float(item["grade"]), item["text"]) for item in exemplars]
+        for kpi_name, exemplars in raw_bank.items()
+    }
+
+
+class ExemplarIndex:
     """
-    Calculate a normalized score for an ESG narrative based on its similarity 
-    to best and worst response benchmarks using Sentence-BERT embeddings.
-    
+    Graded exemplar answers per qualitative KPI held in a vector index.
+
+    Every KPI's bank contains its best (grade 1) and worst (grade 0) reference
+    answers plus any graded exemplars from kpi_exemplars.json. A narrative is
+    scored as the softmax-weighted mean grade of its k nearest exemplars.
+    """
+
+    def __init__(self,
+                exemplar_bank: Dict[str, List[Tuple[float, str]]],
+                reference_index: ReferenceEmbeddingIndex,
+                index_kind: str = "auto"):
+        self.index_kind = index_kind
+        self.grades: Dict[str, np.ndarray] = {}
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.indexes = {}
+
+        exemplar_bank = {
+            kpi_name: exemplars
+            for kpi_name, exemplars in exemplar_bank.items()
+            if kpi_name in reference_index.kpi_positions
+        }
+        for kpi_name in reference_index.kpi_positions:
+            best_embedding, worst_embedding = reference_index.get(kpi_name)
+            self.grades[kpi_name] = np.asarray([1.0, 0.0], dtype=np.float32)
+            self.vectors[kpi_name] = np.stack([best_embedding, worst_embedding])
+
+        # Embed every bank exemplar in one pass, then split per KPI
+        texts = [text for exemplars in exemplar_bank.values() for _, text in exemplars]
+        embeddings = embed_documents(texts) if texts else None
+        offset = 0
+        for kpi_name, exemplars in exemplar_bank.items():
+            count = len(exemplars)
+            self._append(kpi_name, [grade for grade, _ in exemplars], embeddings[offset:offset + count])
+            offset += count
+
+        for kpi_name in self.vectors:
+            self._rebuild(kpi_name)
+
+    def _append(self, kpi_name: str, grades: List[float], embeddings: np.ndarray):
+        self.grades[kpi_name] = np.concatenate([self.grades[kpi_name], np.asarray(grades, dtype=np.float32)])
+        self.vectors[kpi_name] = np.concatenate([self.vectors[kpi_name], embeddings])
+
+    def _rebuild(self, kpi_name: str):
+        self.indexes[kpi_name] = build_vector_index(self.vectors[kpi_name], kind=self.index_kind)
+
+    def has(self, kpi_name: str) -> bool:
+        return kpi_name in self.indexes
+
+    def add_exemplars(self, kpi_name: str, exemplars: List[Tuple[float, str]]):
+        """Add graded (grade, text) exemplars to a KPI's bank and reindex it"""
+        if not self.has(kpi_name):
+            raise KeyError(f"No reference answers found for KPI: {kpi_name}")
+        embeddings = embed_documents([text for _, text in exemplars])
+        self._append(kpi_name, [grade for grade, _ in exemplars], embeddings)
+        self._rebuild(kpi_name)
+
+    def score_many(self,
+                kpi_name: str,
+                user_embeddings: np.ndarray,
+                k: int = EXEMPLAR_NEIGHBOURS) -> np.ndarray:
+        """Score a (n, dim) matrix of narrative embeddings against one KPI's bank"""
+        if not self.has(kpi_name):
+            raise KeyError(f"No reference answers found for KPI: {kpi_name}")
+        indices, similarities = self.indexes[kpi_name].search_batch(user_embeddings, k)
+        logits = similarities / EXEMPLAR_TEMPERATURE
+        weights = np.exp(logits - logits.max(axis=1, keepdims=True))
+        weights /= weights.sum(axis=1, keepdims=True)
+        return (weights * self.grades[kpi_name][indices]).sum(axis=1)
+
+    def score(self, kpi_name: str, user_embedding: np.ndarray, k: int = EXEMPLAR_NEIGHBOURS) -> float:
+        return float(self.score_many(kpi_name, user_embedding[None, :], k)[0])
+
+
+def get_exemplar_index() -> ExemplarIndex:
+    """Return the process-wide exemplar index, building it on first use"""
+    global _exemplar_index
+    reference_index = get_reference_index()
+    with _exemplar_index_lock:
+        if _exemplar_index is None:
+            _exemplar_index = ExemplarIndex(load_exemplar_bank(), reference_index)
+        return _exemplar_index
+
+
+def _warm_up():
+    start = time.perf_counter()
+    try:
+        get_exemplar_index()
+    except Exception:
+        logging.error("Narrative scoring warm-up failed", exc_info=True)
+        return
+    logging.info(f"Narrative scoring indexes ready in {time.perf_counter() - start:.1f}s")
+
+
+def warm_up_scoring() -> threading.Thread:
+    """
+    Load the embedding model and the anchor and exemplar indexes in the background.
+
+    Called at app start, so the first narrative submitted does not wait for
+    the model to load or the anchors to be memory-mapped (or built when
+    missing). Safe to call on every rerun; only the first call starts a
+    thread.
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, name="scoring-warmup", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
+
+
+def _normalized_score(user_embedding: np.ndarray,
+                    best_embedding: np.ndarray,
+                    worst_embedding: np.ndarray) -> float:
+    distance_to_best = float(np.linalg.norm(user_embedding - best_embedding))
+    distance_to_worst = float(np.linalg.norm(user_embedding - worst_embedding))
+    total = distance_to_best + distance_to_worst
+    if total == 0:
+        return 0.5
+    return distance_to_worst / total
+
+
+def _normalized_scores(user_embeddings: np.ndarray,
+                    best_embeddings: np.ndarray,
+                    worst_embeddings: np.ndarray) -> np.ndarray:
+    """Row-wise version of _normalized_score for (n, dim) matrices"""
+    distance_to_best = np.linalg.norm(user_embeddings - best_embeddings, axis=1)
+    distance_to_worst = np.linalg.norm(user_embeddings - worst_embeddings, axis=1)
+    total = distance_to_best + distance_to_worst
+    safe_total = np.where(total == 0, 1.0, total)
+    return np.where(total == 0, 0.5, distance_to_worst / safe_total)
+
+
+def score_esg_narrative(user_input, kpi_name, method="exemplars"):
+    """
+    Calculate a normalized score for an ESG narrative based on its similarity
+    to benchmark answers using the configured embedding backend.
+
+    The benchmark embeddings are precomputed, so only the user's narrative is
+    encoded here. Narratives longer than the encoder window are chunked and
+    pooled so the whole answer counts.
+
     Args:
         user_input (str): The narrative to be scored
-        best_response (str): The benchmark best response
-        worst_response (str): The benchmark worst response
-        
+        kpi_name (str): The qualitative KPI whose benchmarks are used
+        method (str): 'exemplars' to grade against the k nearest exemplars,
+            'anchors' to compare distances to the best and worst response only
+
     Returns:
         float: A score between 0 and 1, where:
             - Scores closer to 1 indicate similarity to the best response
             - Scores closer to 0 indicate similarity to the worst response
     """
-    best_response, worst_response=get_answer_range(kpi_name)
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    user_embedding = model.encode(user_input, convert_to_tensor=True)
-    best_embedding = model.encode(best_response, convert_to_tensor=True)
-    worst_embedding = model.encode(worst_response, convert_to_tensor=True)
-    
-    distance_to_best = torch.dist(user_embedding, best_embedding).item()
-    distance_to_worst = torch.dist(user_embedding, worst_embedding).item()
-    normalized_score = distance_to_worst / (distance_to_best + distance_to_worst)
-    
-    return normalized_score
\ No newline at end of file
+    user_embedding = embed_documents([user_input])[0]
+    logging.debug(f"Embedding cache stats: {get_embedding_cache().stats()}")
+    if method == "exemplars":
+        return get_exemplar_index().score(kpi_name, user_embedding)
+    if method == "anchors":
+        best_embedding, worst_embedding = get_reference_index().get(kpi_name)
+        return _normalized_score(user_embedding, best_embedding, worst_embedding)
+    raise ValueError(f"Unknown scoring method: {method}")
+
+
+def score_esg_narratives(items: Iterable[Tuple[str, str]],
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        use_cache: bool = True,
+                        method: str = "exemplars") -> List[float]:
+    """
+    Score many narratives at once.
+
+    Texts are chunked and encoded in batches of batch_size and all
+    similarities are computed as matrix operations per KPI.
+
+    Args:
+        items (Iterable[Tuple[str, str]]): (kpi_name, user_input) pairs
+        batch_size (int): Number of texts per encoder forward pass
+        use_cache (bool): Serve previously seen texts from the embedding cache
+        method (str): 'exemplars' or 'anchors', see score_esg_narrative
+
+    Returns:
+        List[float]: Scores between 0 and 1, in input order
+    """
+    items = list(items)
+    if not items:
+        return []
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    if method not in ("exemplars", "anchors"):
+        raise ValueError(f"Unknown scoring method: {method}")
+
+    kpi_names = [kpi_name for kpi_name, _ in items]
+    texts = [text for _, text in items]
+    if method == "anchors":
+        best_embeddings, worst_embeddings = get_reference_index().get_many(kpi_names)
+    else:
+        exemplar_index = get_exemplar_index()
+        for kpi_name in set(kpi_names):
+            if not exemplar_index.has(kpi_name):
+                raise KeyError(f"No reference answers found for KPI: {kpi_name}")
+
+    start = time.perf_counter()
+    user_embeddings = np.concatenate([
+        embed_documents(texts[i:i + batch_size], batch_size=batch_size, use_cache=use_cache)
+        for i in range(0, len(texts), batch_size)
+    ])
+    if method == "anchors":
+        scores = _normalized_scores(user_embeddings, best_embeddings, worst_embeddings)
+    else:
+        scores = np.zeros(len(texts), dtype=np.float64)
+        positions_by_kpi: Dict[str, List[int]] = {}
+        for position, kpi_name in enumerate(kpi_names):
+            positions_by_kpi.setdefault(kpi_name, []).append(position)
+        for kpi_name, positions in positions_by_kpi.items():
+            scores[positions] = exemplar_index.score_many(kpi_name, user_embeddings[positions])
+    elapsed = time.perf_counter() - start
+
+    logging.info(
+        f"Scored {len(texts)} narratives with batch size {batch_size}: "
+        f"{len(texts) / elapsed if elapsed > 0 else float('inf'):.1f} texts/s"
+    )
+    return scores.tolist()
+
+
+def benchmark_narrative_scoring(items: Sequence[Tuple[str, str]],
+                                batch_sizes: Sequence[int] = (1, 8, 16, 32, 64)) -> Dict[int, float]:
+    """
+    Measure scoring throughput for each batch size.
+
+    Args:
+        items (Sequence[Tuple[str, str]]): (kpi_name, user_input) pairs
+        batch_sizes (Sequence[int]): Batch sizes to try
+
+    Returns:
+        Dict[int, float]: Texts per second for each batch size
+    """
+    # Load the model and indexes up front so they are not part of the timing
+    get_exemplar_index()
+    throughput = {}
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        # Bypass the cache so every batch size pays for real encoding
+        score_esg_narratives(items, batch_size=batch_size, use_cache=False)
+        elapsed = time.perf_counter() - start
+        throughput[batch_size] = len(items) / elapsed if elapsed > 0 else float("inf")
+    return throughput
+
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(description="Narrative scoring utilities")
+    parser.add_argument(
+        "--benchmark",
+        metavar="CSV",
+        help="CSV with 'kpi' and 'text' columns to measure batch scoring throughput"
+    )
+    args = parser.parse_args()
+
+    # Precompute the anchor index so the app can memory-map it at startup
+    index = get_reference_index()
+    print(f"Anchor index ready: {index.array_path} ({len(index.kpi_positions)} KPIs)")
+
+    if args.benchmark:
+        with open(args.benchmark, "r", encoding="utf-8", newline="") as f:
+            rows = [(row["kpi"], row["text"]) for row in csv.DictReader(f)]
+        for batch_size, texts_per_second in benchmark_narrative_scoring(rows).items():
+            print(f"batch_size={batch_size:>4}: {texts_per_second:8.1f} texts/s")
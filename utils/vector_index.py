@@ -0,0 +1,139 @@
+from typing import Tuple
+
+import numpy as np
+
+# Above this many vectors the auto index switches from brute force to IVF
+ANN_THRESHOLD = 2000
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest similarities, best first"""
+    k = min(k, len(similarities))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-similarities, k - 1)[:k]
+    return candidates[np.argsort(-similarities[candidates])]
+
+
+class BruteForceVectorIndex:
+    """Exact cosine-similarity search with a single matrix-vector product"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = _normalize_rows(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar vectors to query.
+
+        Returns:
+            tuple: (indices, cosine similarities), best match first
+        """
+        similarities = self.vectors @ _normalize_rows(query)
+        indices = _top_k(similarities, k)
+        return indices, similarities[indices]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row-wise search for a (n, dim) query matrix in one matrix product"""
+        similarities = _normalize_rows(queries) @ self.vectors.T
+        k = min(k, similarities.shape[1])
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        candidate_sims = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-candidate_sims, axis=1)
+        return (np.take_along_axis(candidates, order, axis=1),
+                np.take_along_axis(candidate_sims, order, axis=1))
+
+
+class IVFVectorIndex:
+    """
+    Approximate cosine-similarity search with an inverted-file layout.
+
+    Vectors are clustered with spherical k-means into n_lists buckets; a query
+    only scans the n_probe buckets whose centroids are closest, so query cost
+    grows with roughly sqrt(n) instead of n.
+    """
+
+    def __init__(self,
+                vectors: np.ndarray,
+                n_lists: int = None,
+                n_probe: int = 4,
+                n_iter: int = 10,
+                seed: int = 0):
+        self.vectors = _normalize_rows(vectors)
+        n = len(self.vectors)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = max(1, min(n_probe, self.n_lists))
+        self.centroids, assignments = self._train(n_iter, seed)
+        self.lists = [np.flatnonzero(assignments == i) for i in range(self.n_lists)]
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _train(self, n_iter: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(seed)
+        start = rng.choice(len(self.vectors), size=self.n_lists, replace=False)
+        centroids = self.vectors[start].copy()
+        assignments = np.zeros(len(self.vectors), dtype=np.int64)
+        for _ in range(n_iter):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for i in range(self.n_lists):
+                members = self.vectors[assignments == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        return centroids, np.argmax(self.vectors @ centroids.T, axis=1)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximately the k most similar vectors to query.
+
+        Returns:
+            tuple: (indices, cosine similarities), best match first
+        """
+        query = _normalize_rows(query)
+        k = min(k, len(self.vectors))
+        buckets = []
+        found = 0
+        # Probe the closest buckets, widening until at least k candidates are seen
+        for probe in _top_k(self.centroids @ query, self.n_lists):
+            buckets.append(self.lists[probe])
+            found += len(self.lists[probe])
+            if len(buckets) >= self.n_probe and found >= k:
+                break
+        candidates = np.concatenate(buckets)
+        similarities = self.vectors[candidates] @ query
+        best = _top_k(similarities, k)
+        return candidates[best], similarities[best]
+
+    def search_batch(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row-wise search for a (n, dim) query matrix"""
+        results = [self.search(query, k) for query in queries]
+        return np.stack([r[0] for r in results]), np.stack([r[1] for r in results])
+
+
+def build_vector_index(vectors: np.ndarray, kind: str = "auto"):
+    """
+    Build a vector index over vectors.
+
+    Args:
+        vectors (np.ndarray): (n, dim) array of embeddings
+        kind (str): 'brute', 'ivf', or 'auto' to pick IVF above ANN_THRESHOLD vectors
+
+    Returns:
+        BruteForceVectorIndex or IVFVectorIndex
+    """
+    if kind == "auto":
+        kind = "ivf" if len(vectors) > ANN_THRESHOLD else "brute"
+    if kind == "brute":
+        return BruteForceVectorIndex(vectors)
+    if kind == "ivf":
+        return IVFVectorIndex(vectors)
+    raise ValueError(f"Unknown vector index type: {kind}")